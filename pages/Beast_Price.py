@@ -0,0 +1,135 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from src.data_preprocessing import load_products
+from src.price_impact import STUDY_FEATURES, run_price_study, study_variants
+
+def show_price_impact_page():
+    """صفحة دراسة تأثير السعر على جودة العنقدة"""
+    
+    st.markdown("""
+    <style>
+    .simple-title {
+        font-size: 2rem;
+        color: #1f77b4;
+        text-align: center;
+        margin-bottom: 2rem;
+        border-bottom: 2px solid #1f77b4;
+        padding-bottom: 1rem;
+    }
+    
+    .decision-card {
+        background: #f8f9fa;
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 0.5rem 0;
+        border-left: 4px solid #28a745;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+    
+    st.markdown('<h1 class="simple-title">💰 دراسة تأثير السعر على العنقدة</h1>', unsafe_allow_html=True)
+    
+    try:
+        # تحميل البيانات
+        products_df = load_products_data()
+        
+        st.markdown("""
+        نقارن بين عنقدة مع تضمين السعر وعنقدة بدونه: نختار عينات من كل عنقود،
+        ونقيّم تشابهها مع باقي منتجات العنقود بدرجة من 100، ثم نحسب المتوسط.
+        """)
+        
+        # إعدادات التجربة
+        st.subheader("⚙️ إعدادات التجربة")
+        
+        available_columns = [col for col in STUDY_FEATURES if col in products_df.columns]
+        selected_features = st.multiselect(
+            "الخصائص الأساسية للعنقدة:",
+            available_columns,
+            default=available_columns
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            n_clusters = st.slider("عدد المجموعات:", 2, 6, 3)
+        with col2:
+            all_subsets = st.checkbox("مقارنة كل توليفات الخصائص", value=False)
+        
+        if not selected_features:
+            st.warning("يرجى اختيار خاصية واحدة على الأقل")
+            return
+        
+        # التجارب المحفوظة تُقرأ مباشرة وغير المحفوظة تُشغل بالتوازي
+        variants = study_variants(selected_features, all_subsets)
+        with st.spinner(f"جاري تشغيل {len(variants)} تجربة..."):
+            results = run_price_study(products_df, variants, n_clusters)
+        
+        results_df = pd.DataFrame({
+            'الخصائص': [' + '.join(r['features']) for r in results],
+            'يتضمن السعر': ['نعم' if r['includes_price'] else 'لا' for r in results],
+            'متوسط التشابه': [round(r['avg_similarity'], 2) for r in results],
+            'أحجام المجموعات': [', '.join(map(str, r['cluster_sizes'])) for r in results]
+        }).sort_values('متوسط التشابه', ascending=False)
+        
+        # النتائج
+        st.subheader("📊 نتائج التجارب")
+        
+        fig = px.bar(
+            results_df,
+            x='متوسط التشابه',
+            y='الخصائص',
+            color='يتضمن السعر',
+            orientation='h',
+            title='متوسط التشابه داخل العناقيد لكل توليفة خصائص'
+        )
+        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(results_df, use_container_width=True)
+        
+        # المقارنة والقرار
+        show_price_decision(results_df)
+    
+    except Exception as e:
+        st.error(f"خطأ في تحميل البيانات: {str(e)}")
+
+def load_products_data():
+    """تحميل بيانات المنتجات"""
+    return load_products()
+
+def show_price_decision(results_df):
+    """مقارنة أفضل نتيجة مع السعر وبدونه واتخاذ القرار"""
+    with_price = results_df[results_df['يتضمن السعر'] == 'نعم']['متوسط التشابه']
+    without_price = results_df[results_df['يتضمن السعر'] == 'لا']['متوسط التشابه']
+    
+    if with_price.empty or without_price.empty:
+        st.info("اختر السعر مع خاصية أخرى على الأقل للمقارنة مع وبدون السعر")
+        return
+    
+    st.subheader("⚖️ المقارنة")
+    
+    best_with, best_without = with_price.max(), without_price.max()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("أفضل نتيجة مع السعر", f"{best_with:.2f}")
+    with col2:
+        st.metric("أفضل نتيجة بدون السعر", f"{best_without:.2f}")
+    with col3:
+        st.metric("الفرق", f"{best_with - best_without:+.2f}")
+    
+    if best_with > best_without:
+        decision = "تضمين السعر يحسن جودة العنقدة"
+    elif best_with < best_without:
+        decision = "العنقدة بدون السعر أفضل، فالسعر يضعف تشابه المنتجات داخل العناقيد"
+    else:
+        decision = "لا يوجد فرق واضح لتأثير السعر"
+    
+    st.markdown(f"""
+    <div class="decision-card">
+        <h4>📌 القرار</h4>
+        <p>{decision}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+if __name__ == "__main__":
+    show_price_impact_page()
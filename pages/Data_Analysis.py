@@ -1,6 +1,14 @@
+import os
 import streamlit as st
 import pandas as pd
-import numpy as np
+from src.data_preprocessing import PRODUCTS_FILE, INVOICES_FILE, PRODUCTS_DTYPES, INVOICES_DTYPES
+from src.profiling import load_or_profile, profile_table
+
+# الملفات المتاحة للتحليل: (المسار، الأنواع)
+DATA_FILES = {
+    "المنتجات": (PRODUCTS_FILE, PRODUCTS_DTYPES),
+    "الفواتير": (INVOICES_FILE, INVOICES_DTYPES)
+}
 
 def show_data_analysis_page():
     """صفحة تحليل البيانات البسيطة - القيم المفقودة فقط"""
@@ -62,13 +70,17 @@ def show_data_analysis_page():
     
     st.markdown('<h1 class="main-title">📊 فحص القيم المفقودة</h1>', unsafe_allow_html=True)
     
-    # تحميل البيانات
+    # تحليل الملف على دفعات دون تحميله كاملاً
     try:
-        products_df = load_data()
+        selected_file = st.radio("الملف:", list(DATA_FILES.keys()), horizontal=True)
+        path, dtypes = DATA_FILES[selected_file]
+        profile = load_profile(path, dtypes)
+        columns_profile = profile_table(profile)
+        n_rows = profile['rows']
         
         # عدد القيم المفقودة الإجمالي
-        total_missing = products_df.isnull().sum().sum()
-        total_cells = products_df.shape[0] * products_df.shape[1]
+        total_missing = int(columns_profile['nulls'].sum())
+        total_cells = n_rows * len(columns_profile)
         
         # عرض النتيجة الرئيسية
         if total_missing == 0:
@@ -97,8 +109,8 @@ def show_data_analysis_page():
         with col1:
             st.markdown(f"""
             <div class="simple-card">
-                <h3 style="color: #1f77b4;">📦 عدد المنتجات</h3>
-                <p class="big-number" style="font-size: 2rem;">{len(products_df)}</p>
+                <h3 style="color: #1f77b4;">📦 عدد الصفوف</h3>
+                <p class="big-number" style="font-size: 2rem;">{n_rows}</p>
             </div>
             """, unsafe_allow_html=True)
         
@@ -106,7 +118,7 @@ def show_data_analysis_page():
             st.markdown(f"""
             <div class="simple-card">
                 <h3 style="color: #28a745;">📋 عدد الأعمدة</h3>
-                <p class="big-number" style="font-size: 2rem;">{len(products_df.columns)}</p>
+                <p class="big-number" style="font-size: 2rem;">{len(columns_profile)}</p>
             </div>
             """, unsafe_allow_html=True)
         
@@ -123,25 +135,40 @@ def show_data_analysis_page():
             st.markdown("---")
             st.subheader("📋 تفاصيل القيم المفقودة لكل عمود")
             
-            missing_data = products_df.isnull().sum()
-            missing_data = missing_data[missing_data > 0]  # عرض الأعمدة التي بها قيم مفقودة فقط
+            missing_data = columns_profile[columns_profile['nulls'] > 0]  # عرض الأعمدة التي بها قيم مفقودة فقط
             
             if len(missing_data) > 0:
                 missing_df = pd.DataFrame({
-                    'اسم العمود': missing_data.index,
-                    'عدد القيم المفقودة': missing_data.values,
-                    'النسبة المئوية': ((missing_data.values / len(products_df)) * 100).round(1)
+                    'اسم العمود': missing_data['column'].values,
+                    'عدد القيم المفقودة': missing_data['nulls'].values,
+                    'النسبة المئوية': ((missing_data['nulls'].values / n_rows) * 100).round(1)
                 })
                 
                 st.markdown('<div class="table-container">', unsafe_allow_html=True)
                 st.dataframe(missing_df, use_container_width=True, hide_index=True)
                 st.markdown('</div>', unsafe_allow_html=True)
         
+        # ملخص كل عمود من التحليل المدمج
+        st.markdown("---")
+        st.subheader("📈 ملخص الأعمدة")
+        summary_df = pd.DataFrame({
+            'اسم العمود': columns_profile['column'],
+            'النوع': columns_profile['type'].map({'numeric': 'رقمي', 'text': 'نصي'}),
+            'القيم المفقودة': columns_profile['nulls'],
+            'القيم المختلفة (تقريبي)': columns_profile['distinct'],
+            'الأصغر': columns_profile['min'],
+            'المتوسط': columns_profile['mean'],
+            'الوسيط (تقريبي)': columns_profile['p50'],
+            'المئين 99 (تقريبي)': columns_profile['p99'],
+            'الأكبر': columns_profile['max']
+        })
+        st.dataframe(summary_df.round(2), use_container_width=True, hide_index=True)
+        
         # عرض عينة من البيانات
         st.markdown("---")
         st.subheader("👀 نظرة سريعة على البيانات")
         st.markdown('<div class="table-container">', unsafe_allow_html=True)
-        st.dataframe(products_df.head(), use_container_width=True)
+        st.dataframe(pd.read_csv(path, nrows=5), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # رسالة بسيطة للمبتدئين
@@ -162,11 +189,11 @@ def show_data_analysis_page():
         st.error(f"خطأ في تحميل البيانات: {str(e)}")
         st.info("يرجى التأكد من وجود ملف البيانات في المجلد الصحيح")
 
-def load_data():
-    """تحميل البيانات"""
-    # محاولة تحميل من ملف CSV
-    df = pd.read_csv("data/Extended_Products_Dataset__25_Products.csv")
-    return df
+def load_profile(path, dtypes):
+    """تحليل الملف (أو قراءة التحليل المحفوظ إذا لم يتغير الملف)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return load_or_profile(path, dtypes)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,31 @@
+import os
 import streamlit as st
 import pandas as pd
-from itertools import combinations
+from src.association_rules import find_pair_rules, find_top_k_rules, mine_association_rules, sort_rules
+from src.rule_store import (
+    load_or_build_baskets, load_or_build_bitmap_index, load_or_mine_rules, load_or_mine_top_k_rules
+)
+from src.invoice_bitmaps import build_invoice_bitmaps
+from src.hierarchical_rules import ITEM_LEVELS, LEVEL_LABELS, find_hierarchical_rules, load_or_mine_hierarchical_rules
+from src.incremental_rules import get_incremental_miner
+from src.data_preprocessing import INVOICES_FILE, PRODUCTS_FILE, load_invoices, load_products, invoice_columns
+from src.baskets import baskets_from_frame
+from src.parallel_mining import default_workers
+from src.tracing import traced
+
+# عدد أرقام الفواتير المعروضة في نتيجة الاستعلام
+MAX_LISTED_INVOICES = 100
+
+MINING_MODES = {
+    "🏆 أفضل K قاعدة": 'top_k',
+    "حدود دعم وثقة يدوية": 'thresholds',
+    "📚 متعددة المستويات": 'hierarchy'
+}
+TOP_K_METRIC_LABELS = {'confidence': "الثقة", 'lift': "الرفع", 'support': "الدعم"}
+DEFAULT_TOP_K = 50
+
+# سلال البيانات التجريبية مع الجدول الذي بُنيت منه، وفهرس الفواتير مع السلال التي بُني منها
+_demo_bitmaps = {}
 
 def show_association_rules_page():
     """صفحة قواعد الارتباط البسيطة"""
@@ -46,8 +71,8 @@ def show_association_rules_page():
         # تحليل بسيط للفواتير
         st.subheader("🛒 تحليل سلة التسوق")
         
-        # إنشاء قاعدة بيانات الفواتير
-        basket_data = create_basket_data(invoices_df)
+        # إنشاء قاعدة بيانات الفواتير (من الفهرس المخزن عند وجود ملف الفواتير)
+        basket_data = get_basket_data(invoices_df)
         
         # عرض أشهر المنتجات
         st.subheader("⭐ أشهر المنتجات")
@@ -60,10 +85,58 @@ def show_association_rules_page():
             </div>
             """, unsafe_allow_html=True)
         
-        # قواعد ارتباط بسيطة
-        st.subheader("🔗 قواعد الارتباط البسيطة")
+        # قواعد ارتباط متعددة المستويات
+        st.subheader("🔗 قواعد الارتباط")
         
-        rules = find_simple_rules(basket_data)
+        mining_mode = st.radio("طريقة التنقيب:", list(MINING_MODES), horizontal=True)
+        
+        if MINING_MODES[mining_mode] == 'top_k':
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                top_k = st.number_input("عدد القواعد:", 5, 500, DEFAULT_TOP_K, 5)
+            with col2:
+                metric = st.selectbox("الترتيب حسب:", list(TOP_K_METRIC_LABELS), format_func=TOP_K_METRIC_LABELS.get)
+            with col3:
+                max_len = st.slider("أقصى طول لمجموعة المنتجات:", 2, 5, 3)
+            
+            st.caption("حد الدعم أو الثقة يرتفع تلقائياً كلما امتلأت قائمة أفضل القواعد فلا حاجة لضبطه يدوياً")
+            rules = get_top_k_rules(basket_data, top_k, metric, max_len)
+        elif MINING_MODES[mining_mode] == 'hierarchy':
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                min_support = st.slider("الحد الأدنى للدعم:", 0.01, 0.5, 0.05, 0.01)
+            with col2:
+                min_confidence = st.slider("الحد الأدنى للثقة:", 0.1, 1.0, 0.5, 0.05)
+            with col3:
+                max_len = st.slider("أقصى طول لمجموعة العناصر:", 2, 5, 3)
+            
+            levels = st.multiselect(
+                "المستويات:", list(ITEM_LEVELS), default=list(ITEM_LEVELS), format_func=LEVEL_LABELS.get
+            )
+            st.caption("كل فاتورة تُرفع إلى علامات وفئات منتجاتها وتُعد كل المستويات في تنقيب واحد، مثل: Storage ⇒ Accessories")
+            rules = get_hierarchical_rules(basket_data, min_support, min_confidence, max_len, levels) if levels else []
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                min_support = st.slider("الحد الأدنى للدعم:", 0.01, 0.5, 0.1, 0.01)
+            with col2:
+                min_confidence = st.slider("الحد الأدنى للثقة:", 0.1, 1.0, 0.5, 0.05)
+            with col3:
+                max_len = st.slider("أقصى طول لمجموعة المنتجات:", 2, 5, 3)
+            
+            n_workers = st.number_input("عدد العمليات المتوازية للتنقيب:", 1, default_workers(), 1)
+            
+            # نافذة زمنية متحركة (فقط إذا كانت الفواتير تحتوي على تاريخ)
+            last_days = None
+            if 'InvoiceDate' in invoice_columns() and os.path.exists(INVOICES_FILE):
+                if st.checkbox("عرض القواعد لآخر N يوم فقط"):
+                    last_days = st.number_input("عدد الأيام:", 1, 3650, 30)
+                    st.caption("تُحسب قواعد النافذة الزمنية (منتج ← منتج) من عدادات تُحدَّث بالفواتير الجديدة فقط")
+            
+            if last_days is not None:
+                rules = get_window_rules(min_support, min_confidence, last_days)
+            else:
+                rules = get_rules(basket_data, min_support, min_confidence, max_len, n_workers)
         
         if rules:
             for rule in rules[:5]:  # عرض أول 5 قواعد
@@ -71,12 +144,24 @@ def show_association_rules_page():
                 <div class="rule-card">
                     <strong>إذا اشترى العميل:</strong> {rule['antecedent']} <br>
                     <strong>فمن المحتمل أن يشتري:</strong> {rule['consequent']} <br>
-                    <strong>نسبة الثقة:</strong> {rule['confidence']:.1%}
+                    <strong>نسبة الثقة:</strong> {rule['confidence']:.1%} <br>
+                    <strong>معامل الرفع:</strong> {rule['lift']:.2f}
                 </div>
                 """, unsafe_allow_html=True)
+            
+            with st.expander(f"جميع القواعد ({len(rules)})"):
+                rules_df = pd.DataFrame(rules)[['antecedent', 'consequent', 'support', 'confidence', 'lift']]
+                rules_df.columns = ['المقدمة', 'النتيجة', 'الدعم', 'الثقة', 'الرفع']
+                st.dataframe(rules_df.round(3), use_container_width=True, hide_index=True)
         else:
             st.info("لم يتم العثور على قواعد ارتباط قوية في البيانات الحالية")
         
+        # استعلام فوري من فهرس (منتج ← فواتير) دون المرور على السلال
+        st.subheader("🔎 كم فاتورة تحتوي هذه المنتجات معاً؟")
+        query = st.text_input("أرقام المنتجات مفصولة بفواصل:", placeholder="مثال: 3, 7, 12")
+        if query:
+            show_invoice_query(get_bitmap_index(basket_data), query)
+        
         # عرض عينة من البيانات
         st.subheader("👀 عينة من بيانات الفواتير")
         st.dataframe(invoices_df.head(10), use_container_width=True)
@@ -86,68 +171,115 @@ def show_association_rules_page():
 
 def load_invoice_data():
     """تحميل بيانات الفواتير"""
-    try:
-        df = pd.read_csv("data/Invoices_Dataset_for_Association_Rules.csv")
-        return df
-    except:
-        # إنشاء بيانات تجريبية
-        data = {
-            'InvoiceID': [2001, 2001, 2001, 2001, 2002, 2002, 2002, 2002, 2002, 2003, 2003, 2004],
-            'ProductID': [17, 9, 25, 1, 13, 8, 19, 11, 25, 16, 22, 23],
-            'Quantity': [1, 1, 2, 1, 1, 1, 3, 1, 1, 1, 1, 2]
-        }
-        return pd.DataFrame(data)
+    # الصفحة لا تحتاج إلا رقم الفاتورة ورقم المنتج
+    return load_invoices(columns=['InvoiceID', 'ProductID'])
 
+@traced("create_basket_data")
 def create_basket_data(invoices_df):
     """إنشاء بيانات سلة التسوق"""
-    basket = invoices_df.groupby('InvoiceID')['ProductID'].apply(list).to_dict()
-    return basket
+    # بنية CSR مضغوطة بدلاً من قاموس قوائم بايثون
+    return baskets_from_frame(invoices_df)
 
+def get_basket_data(invoices_df):
+    """سلال الملف من فهرس السلال المخزن (مرة واحدة لكل نسخة من الملف)، أو من الجدول للبيانات التجريبية"""
+    if os.path.exists(INVOICES_FILE):
+        return load_or_build_baskets(INVOICES_FILE)
+    
+    cached = _demo_bitmaps.get('baskets')
+    if cached is None or cached[0] is not invoices_df:
+        cached = (invoices_df, create_basket_data(invoices_df))
+        _demo_bitmaps['baskets'] = cached
+    return cached[1]
+
+@traced("find_simple_rules")
 def find_simple_rules(basket_data, min_support=0.1, min_confidence=0.5):
     """البحث عن قواعد ارتباط بسيطة"""
-    # حساب تكرار المنتجات الفردية
-    all_items = []
-    for items in basket_data.values():
-        all_items.extend(items)
+    # حساب الدعم والثقة لكل الأزواج دفعة واحدة من مصفوفة الوقوع المتناثرة
+    return find_pair_rules(basket_data, min_support, min_confidence)
+
+def find_association_rules(basket_data, min_support=0.1, min_confidence=0.5, max_len=None):
+    """البحث عن قواعد ارتباط بأي عدد من المنتجات في المقدمة والنتيجة"""
+    return sort_rules(mine_association_rules(basket_data, min_support, min_confidence, max_len))
+
+@traced("mine_rules")
+def get_rules(basket_data, min_support=0.1, min_confidence=0.5, max_len=None, n_workers=1):
+    """قراءة القواعد من المخزن على القرص وإعادة التنقيب فقط عند تغير البيانات أو المعاملات"""
+    if os.path.exists(INVOICES_FILE):
+        rules, _ = load_or_mine_rules(
+            INVOICES_FILE, min_support, min_confidence, max_len, n_workers=n_workers
+        )
+        return rules
     
-    item_counts = {}
-    for item in all_items:
-        item_counts[item] = item_counts.get(item, 0) + 1
+    # البيانات التجريبية صغيرة فلا حاجة لتخزينها
+    return find_association_rules(basket_data, min_support, min_confidence, max_len)
+
+def get_bitmap_index(basket_data):
+    """فهرس الفواتير المخزن لملف الفواتير، أو المبني في الذاكرة للبيانات التجريبية"""
+    if os.path.exists(INVOICES_FILE):
+        return load_or_build_bitmap_index(INVOICES_FILE)
     
-    total_transactions = len(basket_data)
+    cached = _demo_bitmaps.get('index')
+    if cached is None or cached[0] is not basket_data:
+        cached = (basket_data, build_invoice_bitmaps(basket_data))
+        _demo_bitmaps['index'] = cached
+    return cached[1]
+
+def parse_product_ids(text):
+    """تحويل نص الاستعلام إلى أرقام منتجات (None إذا كان غير صالح)"""
+    try:
+        product_ids = [int(part) for part in text.replace('،', ',').split(',') if part.strip()]
+    except ValueError:
+        return None
+    return product_ids or None
+
+def show_invoice_query(bitmap_index, query):
+    """عرض عدد الفواتير التي تحتوي كل المنتجات المطلوبة ونسبتها"""
+    product_ids = parse_product_ids(query)
+    if product_ids is None:
+        st.warning("أدخل أرقام منتجات صحيحة مفصولة بفواصل")
+        return
     
-    # العثور على العناصر المتكررة
-    frequent_items = {item: count for item, count in item_counts.items() 
-                     if count / total_transactions >= min_support}
+    count = bitmap_index.support_count(product_ids)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("عدد الفواتير", f"{count:,}")
+    with col2:
+        st.metric("الدعم", f"{count / len(bitmap_index):.2%}" if len(bitmap_index) else "-")
     
-    rules = []
+    unknown = [product_id for product_id in product_ids if product_id not in bitmap_index]
+    if unknown:
+        st.caption(f"منتجات غير موجودة في أي فاتورة: {', '.join(map(str, unknown))}")
     
-    # البحث عن قواعد بسيطة (عنصر واحد -> عنصر واحد)
-    for item1 in frequent_items:
-        for item2 in frequent_items:
-            if item1 != item2:
-                # حساب الثقة
-                both_count = 0
-                item1_count = 0
-                
-                for items in basket_data.values():
-                    if item1 in items:
-                        item1_count += 1
-                        if item2 in items:
-                            both_count += 1
-                
-                if item1_count > 0:
-                    confidence = both_count / item1_count
-                    if confidence >= min_confidence:
-                        rules.append({
-                            'antecedent': f'منتج {item1}',
-                            'consequent': f'منتج {item2}',
-                            'confidence': confidence
-                        })
+    if count:
+        with st.expander(f"أرقام الفواتير (أول {min(count, MAX_LISTED_INVOICES)})"):
+            invoice_ids = bitmap_index.invoices_containing(product_ids)[:MAX_LISTED_INVOICES]
+            st.write(', '.join(map(str, invoice_ids.tolist())))
+
+@traced("mine_top_k_rules")
+def get_top_k_rules(basket_data, k=DEFAULT_TOP_K, metric='confidence', max_len=3):
+    """أفضل K قواعد حسب المعيار المختار، من المخزن على القرص إن وُجد ملف الفواتير"""
+    if os.path.exists(INVOICES_FILE):
+        rules, _ = load_or_mine_top_k_rules(INVOICES_FILE, k, metric, max_len)
+        return rules
+    
+    return find_top_k_rules(basket_data, k, metric, max_len, bitmap_index=get_bitmap_index(basket_data))
+
+@traced("mine_hierarchical_rules")
+def get_hierarchical_rules(basket_data, min_support=0.05, min_confidence=0.5, max_len=3, levels=ITEM_LEVELS):
+    """قواعد بين المنتجات والعلامات والفئات، من المخزن على القرص إن وُجد ملفا الفواتير والمنتجات"""
+    products_df = load_products(columns=['ProductID', 'Brand', 'Category'])
+    levels = tuple(level for level in ITEM_LEVELS if level in levels)
+    if os.path.exists(INVOICES_FILE) and os.path.exists(PRODUCTS_FILE):
+        return load_or_mine_hierarchical_rules(
+            INVOICES_FILE, PRODUCTS_FILE, products_df, min_support, min_confidence, max_len, levels
+        )
     
-    # ترتيب حسب الثقة
-    rules.sort(key=lambda x: x['confidence'], reverse=True)
-    return rules
+    return find_hierarchical_rules(basket_data, products_df, min_support, min_confidence, max_len, levels)
+
+def get_window_rules(min_support, min_confidence, last_days):
+    """قواعد آخر N يوم من العدادات المحدثة تدريجياً دون إعادة قراءة السجل"""
+    miner = get_incremental_miner(INVOICES_FILE)
+    return miner.rules(min_support, min_confidence, last_days)
 
 if __name__ == "__main__":
     show_association_rules_page()
\ No newline at end of file
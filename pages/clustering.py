@@ -1,9 +1,17 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.express as px
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from src.data_preprocessing import load_products
+from src.clustering import (
+    can_warm_start, load_cluster_model, perform_clustering, save_cluster_model
+)
+from src.feature_ablation import run_ablation
+from src.k_selection import load_or_run_k_sweep
+
+# طرق التجميع المتاحة
+CLUSTERING_BACKENDS = {
+    "K-Means": "kmeans",
+    "Mini-Batch K-Means (للكتالوجات الكبيرة)": "minibatch"
+}
 
 def show_clustering_page():
     """صفحة التجميع البسيطة"""
@@ -59,15 +67,53 @@ def show_clustering_page():
         )
         
         if len(selected_features) >= 2:
+            # مسح قيم K مرة واحدة لكل مجموعة خصائص وبيانات ثم القراءة من النتائج المحفوظة
+            sweep = None
+            if st.checkbox("📐 اقتراح عدد المجموعات (منحنى الكوع والسيلويت)"):
+                with st.spinner("جاري تجميع كل قيم K..."):
+                    sweep = load_or_run_k_sweep(products_df, selected_features)
+                show_k_sweep(sweep)
+            
             # عدد المجموعات
-            n_clusters = st.slider("عدد المجموعات:", 2, 6, 3)
+            if sweep is not None:
+                n_clusters = st.slider(
+                    "عدد المجموعات:", int(sweep.ks.min()), int(sweep.ks.max()), sweep.best_k()
+                )
+                row = sweep.metrics().set_index('K').loc[n_clusters]
+                st.caption(
+                    f"Inertia: {row['Inertia']:.1f} | Silhouette: {row['Silhouette']:.3f} | "
+                    f"Davies-Bouldin: {row['DaviesBouldin']:.3f}"
+                )
+            else:
+                n_clusters = st.slider("عدد المجموعات:", 2, 6, 3)
+            
+            # طريقة التجميع
+            backend_label = st.selectbox("طريقة التجميع:", list(CLUSTERING_BACKENDS.keys()))
+            backend = CLUSTERING_BACKENDS[backend_label]
+            
+            # البدء من المراكز المحفوظة يكفيه مرور واحد على البيانات بعد تحديث الكتالوج
+            warm_start = None
+            saved_model = load_cluster_model()
+            if backend == "minibatch" and can_warm_start(saved_model, selected_features, n_clusters):
+                if st.checkbox("البدء من المراكز المحفوظة", value=True):
+                    warm_start = saved_model
             
             # تنفيذ التجميع
             if st.button("🎯 تنفيذ التجميع"):
-                clusters, cluster_centers = perform_clustering(products_df, selected_features, n_clusters)
+                if backend == "kmeans" and sweep is not None and n_clusters in sweep:
+                    # نفس نتيجة K-Means محسوبة مسبقاً في المسح
+                    clusters, cluster_centers = sweep.result(n_clusters)
+                else:
+                    clusters, cluster_centers = perform_clustering(
+                        products_df, selected_features, n_clusters, backend, warm_start
+                    )
                 
-                # إضافة نتائج التجميع للبيانات
-                products_df['Cluster'] = clusters
+                # إضافة نتائج التجميع إلى نسخة حتى لا يتغير الجدول المشترك بين الجلسات
+                products_df = products_df.assign(Cluster=clusters)
+                
+                # حفظ رقم العنقود لكل منتج ليستخدمه نظام التوصية
+                save_cluster_model(products_df, selected_features, clusters, cluster_centers)
+                st.success("تم حفظ رقم العنقود لكل منتج")
                 
                 # عرض النتائج
                 st.subheader("📈 نتائج التجميع")
@@ -116,6 +162,10 @@ def show_clustering_page():
         else:
             st.warning("يرجى اختيار خاصيتين على الأقل للتجميع")
         
+        # البحث عن الخصائص الأكثر تأثيراً في جودة العنقدة
+        with st.expander("🔬 البحث عن أفضل خصائص التجميع"):
+            show_feature_search(products_df)
+        
         # عرض عينة من البيانات
         st.subheader("👀 عينة من البيانات")
         st.dataframe(products_df[['ProductName', 'Category', 'Price', 'Rating']].head(10), use_container_width=True)
@@ -123,42 +173,46 @@ def show_clustering_page():
     except Exception as e:
         st.error(f"خطأ في تحميل البيانات: {str(e)}")
 
-def load_products_data():
-    """تحميل بيانات المنتجات"""
-    try:
-        df = pd.read_csv("data/Extended_Products_Dataset__25_Products.csv")
-        return df
-    except:
-        # إنشاء بيانات تجريبية
-        data = {
-            'ProductName': ['Bluetooth Headset', 'Portable SSD', 'Surge Protector', 'Wireless Mouse', '4K Monitor', 'External HDD', 'Flash Drive', 'Gaming Mouse', 'Conference Webcam', 'Ergonomic Chair', 'Desk Lamp'],
-            'Category': ['Accessories', 'Storage', 'Accessories', 'Accessories', 'Electronics', 'Storage', 'Storage', 'Accessories', 'Electronics', 'Furniture', 'Accessories'],
-            'Price': [55, 80, 30, 15.99, 300, 60, 12, 35, 90, 180, 18],
-            'Rating': [4.2, 4.6, 4.5, 4.4, 5.0, 4.7, 4.3, 4.9, 4.6, 4.9, 4.2],
-            'Stock': [190, 168, 216, 158, 38, 114, 76, 156, 66, 163, 156],
-            'PowerWatt': [5, 2, 5, 2, 0, 5, 5, 0, 20, 30, 5],
-            'WeightKg': [3.56, 1.13, 2.0, 5.26, 0.13, 0.96, 1.3, 2.86, 5.68, 4.14, 5.71]
-        }
-        return pd.DataFrame(data)
-
-def perform_clustering(df, features, n_clusters):
-    """تنفيذ التجميع باستخدام K-Means"""
-    
-    # تحضير البيانات
-    X = df[features].copy()
-    
-    # معالجة القيم المفقودة
-    X = X.fillna(X.mean())
+def show_k_sweep(sweep):
+    """عرض منحنى الكوع والسيلويت من نتائج المسح"""
+    metrics = sweep.metrics()
     
-    # تطبيع البيانات
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = px.line(metrics, x='K', y='Inertia', markers=True, title='منحنى الكوع (Inertia)')
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        fig = px.line(metrics, x='K', y='Silhouette', markers=True, title='معامل السيلويت')
+        st.plotly_chart(fig, use_container_width=True)
     
-    # تطبيق K-Means
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X_scaled)
+    st.info(f"العدد المقترح حسب السيلويت: {sweep.best_k()}")
+    st.dataframe(metrics.round(3), use_container_width=True)
+
+def show_feature_search(products_df):
+    """البحث عن توليفة الخصائص (الرقمية والفئوية) ذات أعلى تشابه داخل العناقيد"""
+    mode_labels = {
+        "اختيار أمامي": "forward",
+        "حذف خلفي": "backward",
+        "كل التوليفات": "exhaustive"
+    }
+    mode_label = st.selectbox("طريقة البحث:", list(mode_labels.keys()))
+    n_clusters = st.slider("عدد المجموعات للتجربة:", 2, 6, 3, key="ablation_clusters")
     
-    return clusters, kmeans.cluster_centers_
+    if st.button("🔬 بدء البحث"):
+        with st.spinner("جاري تقييم توليفات الخصائص..."):
+            search = run_ablation(products_df, mode_labels[mode_label], n_clusters=n_clusters)
+        
+        best_features, best_score = search.best()
+        st.success(f"أفضل توليفة: {' + '.join(best_features)} (متوسط التشابه {best_score:.2f})")
+        st.caption(f"تقييم كامل: {len(search.full)} | مستبعدة مبكراً: {len(search.pruned)}")
+        
+        results = search.results()
+        results['Score'] = results['Score'].round(2)
+        st.dataframe(results, use_container_width=True)
+
+def load_products_data():
+    """تحميل بيانات المنتجات"""
+    return load_products()
 
 if __name__ == "__main__":
     show_clustering_page()
\ No newline at end of file
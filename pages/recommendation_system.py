@@ -1,6 +1,25 @@
+import os
 import streamlit as st
-import pandas as pd
 import numpy as np
+from src.data_preprocessing import INVOICES_FILE, load_invoices, load_products
+from src.association_rules import find_pair_rules
+from src.baskets import baskets_from_frame
+from src.similarity import get_similarity_engine
+from src.product_search import get_search_index
+from src.ann_index import load_or_build_ann_index
+from src.clustering import load_cluster_model, perform_clustering, save_cluster_model
+from src.rule_index import INDEX_MIN_CONFIDENCE, INDEX_MIN_SUPPORT, build_rule_index, load_or_build_rule_index
+from src.tracing import traced
+
+DEFAULT_CLUSTER_FEATURES = ['Price', 'Rating']
+DEFAULT_N_CLUSTERS = 3
+SEARCH_RESULTS = 20
+
+# فهرس "يُشترى معه عادةً" للبيانات التجريبية مع جدول الفواتير الذي بُني منه
+_demo_rule_index = {}
+
+# النموذج المحفوظ بعد مطابقته مع جدول المنتجات الحالي
+_frame_cluster_models = {}
 
 def show_recommendation_page():
     """صفحة نظام التوصية البسيط"""
@@ -54,18 +73,21 @@ def show_recommendation_page():
         # اختيار منتج للحصول على توصيات
         st.subheader("🔍 اختر منتج للحصول على توصيات")
         
-        # عرض قائمة المنتجات
-        product_options = {}
-        for idx, row in products_df.iterrows():
-            product_options[f"{row['ProductName']} - {row['Brand']} (${row['Price']})"] = idx
+        # البحث في الفهرس ثم عرض أفضل النتائج فقط بدلاً من كل الكتالوج
+        search_index = get_search_index(products_df)
+        query = st.text_input("ابحث بالاسم أو العلامة التجارية:", placeholder="مثال: sam ssd")
+        matches = search_index.search(query, SEARCH_RESULTS)
+        
+        if not matches:
+            st.warning("لا توجد منتجات مطابقة للبحث")
         
-        selected_product_display = st.selectbox(
-            "اختر المنتج:",
-            list(product_options.keys())
+        selected_idx = st.selectbox(
+            f"اختر المنتج ({len(matches)} نتيجة):",
+            matches,
+            format_func=search_index.label
         )
         
-        if selected_product_display:
-            selected_idx = product_options[selected_product_display]
+        if selected_idx is not None:
             selected_product = products_df.iloc[selected_idx]
             
             # عرض المنتج المختار
@@ -75,15 +97,15 @@ def show_recommendation_page():
                 <p><strong>الاسم:</strong> {selected_product['ProductName']}</p>
                 <p><strong>العلامة التجارية:</strong> {selected_product['Brand']}</p>
                 <p><strong>الفئة:</strong> {selected_product['Category']}</p>
-                <p><strong>السعر:</strong> ${selected_product['Price']}</p>
-                <p><strong>التقييم:</strong> {selected_product['Rating']} ⭐</p>
+                <p><strong>السعر:</strong> ${selected_product['Price']:.2f}</p>
+                <p><strong>التقييم:</strong> {selected_product['Rating']:.1f} ⭐</p>
             </div>
             """, unsafe_allow_html=True)
             
             # نوع التوصية
             recommendation_type = st.selectbox(
                 "نوع التوصية:",
-                ["حسب الفئة", "حسب السعر المشابه", "حسب التقييم العالي"]
+                ["حسب الفئة", "حسب السعر المشابه", "حسب التقييم العالي", "يُشترى معه عادةً", "الأكثر تشابهاً", "متقاربة الخصائص", "من نفس العنقود"]
             )
             
             # عدد التوصيات
@@ -102,16 +124,14 @@ def show_recommendation_page():
                 
                 if recommendations is not None and len(recommendations) > 0:
                     for i, (idx, product) in enumerate(recommendations.iterrows(), 1):
-                        similarity_score = calculate_similarity_score(selected_product, product)
-                        
                         st.markdown(f"""
                         <div class="recommendation-card">
                             <h4>🏷️ توصية #{i}</h4>
                             <p><strong>الاسم:</strong> {product['ProductName']}</p>
                             <p><strong>العلامة التجارية:</strong> {product['Brand']}</p>
-                            <p><strong>السعر:</strong> ${product['Price']}</p>
-                            <p><strong>التقييم:</strong> {product['Rating']} ⭐</p>
-                            <p><strong>نقاط التشابه:</strong> {similarity_score:.1f}%</p>
+                            <p><strong>السعر:</strong> ${product['Price']:.2f}</p>
+                            <p><strong>التقييم:</strong> {product['Rating']:.1f} ⭐</p>
+                            <p><strong>نقاط التشابه:</strong> {product['SimilarityScore']:.1f}%</p>
                         </div>
                         """, unsafe_allow_html=True)
                 else:
@@ -135,54 +155,96 @@ def show_recommendation_page():
 
 def load_products_data():
     """تحميل بيانات المنتجات"""
-    try:
-        df = pd.read_csv("data/Extended_Products_Dataset__25_Products.csv")
-        return df
-    except:
-        # إنشاء بيانات تجريبية
-        data = {
-            'ProductName': ['Bluetooth Headset', 'Portable SSD', 'Surge Protector', 'Wireless Mouse', '4K Monitor', 'External HDD', 'Flash Drive', 'Gaming Mouse', 'Conference Webcam', 'Ergonomic Chair', 'Desk Lamp', 'USB Cable'],
-            'Brand': ['Sony', 'Samsung', 'Belkin', 'Logitech', 'LG', 'WD', 'SanDisk', 'Razer', 'Logitech', 'IKEA', 'Philips', 'Anker'],
-            'Category': ['Accessories', 'Storage', 'Accessories', 'Accessories', 'Electronics', 'Storage', 'Storage', 'Accessories', 'Electronics', 'Furniture', 'Accessories', 'Accessories'],
-            'Price': [55, 80, 30, 15.99, 300, 60, 12, 35, 90, 180, 18, 8],
-            'Rating': [4.2, 4.6, 4.5, 4.4, 5.0, 4.7, 4.3, 4.9, 4.6, 4.9, 4.2, 4.1],
-            'Stock': [190, 168, 216, 158, 38, 114, 76, 156, 66, 163, 156, 200]
-        }
-        return pd.DataFrame(data)
+    return load_products()
+
+def load_bought_together_index():
+    """فهرس "يُشترى معه عادةً" من قواعد الارتباط"""
+    if os.path.exists(INVOICES_FILE):
+        return load_or_build_rule_index(INVOICES_FILE)
+    
+    # البيانات التجريبية صغيرة فيُبنى الفهرس مباشرة مرة واحدة لكل جدول فواتير
+    invoices_df = load_invoices()
+    cached = _demo_rule_index.get('index')
+    if cached is None or cached[0] is not invoices_df:
+        baskets = baskets_from_frame(invoices_df)
+        index = build_rule_index(find_pair_rules(baskets, INDEX_MIN_SUPPORT, INDEX_MIN_CONFIDENCE))
+        cached = (invoices_df, index)
+        _demo_rule_index['index'] = cached
+    return cached[1]
 
+def get_cluster_model(df):
+    """نموذج العنقدة المحفوظ من صفحة التجميع (أو نموذج افتراضي إذا لم يُحفظ بعد)"""
+    model = load_cluster_model()
+    if model is not None and all(f in df.columns for f in model.features):
+        # أعضاء النموذج مواضع في الجدول الذي دُرّب عليه، فتُطابق مع الجدول الحالي بأرقام المنتجات
+        cached = _frame_cluster_models.get('model')
+        if cached is None or cached[0] is not model or cached[1] is not df:
+            cached = (model, df, model.for_frame(df))
+            _frame_cluster_models['model'] = cached
+        return cached[2]
+    
+    features = [f for f in DEFAULT_CLUSTER_FEATURES if f in df.columns]
+    clusters, cluster_centers = perform_clustering(df, features, DEFAULT_N_CLUSTERS)
+    return save_cluster_model(df, features, clusters, cluster_centers)
+
+@traced("get_recommendations")
 def get_recommendations(df, selected_idx, recommendation_type, num_recommendations):
     """الحصول على التوصيات"""
     
     selected_product = df.iloc[selected_idx]
     
-    # استبعاد المنتج المختار
-    candidates = df.drop(selected_idx)
+    # نقاط التشابه مع كل الكتالوج دفعة واحدة
+    engine = get_similarity_engine(df)
     
     if recommendation_type == "حسب الفئة":
-        # البحث في نفس الفئة
-        recommendations = candidates[
-            candidates['Category'] == selected_product['Category']
-        ].head(num_recommendations)
+        # أكثر المنتجات تشابهاً في نفس الفئة
+        mask = (df['Category'] == selected_product['Category']).to_numpy()
+        positions, scores = engine.top_k(selected_idx, num_recommendations, mask)
         
     elif recommendation_type == "حسب السعر المشابه":
-        # البحث حسب السعر المشابه (±30%)
+        # أكثر المنتجات تشابهاً ضمن نطاق السعر المشابه (±30%)
         price_range = selected_product['Price'] * 0.3
         min_price = selected_product['Price'] - price_range
         max_price = selected_product['Price'] + price_range
         
-        recommendations = candidates[
-            (candidates['Price'] >= min_price) & 
-            (candidates['Price'] <= max_price)
-        ].head(num_recommendations)
+        mask = ((df['Price'] >= min_price) & (df['Price'] <= max_price)).to_numpy()
+        positions, scores = engine.top_k(selected_idx, num_recommendations, mask)
         
     elif recommendation_type == "حسب التقييم العالي":
-        # أعلى التقييمات
-        recommendations = candidates.nlargest(num_recommendations, 'Rating')
+        # أعلى التقييمات (الترتيب محسوب مرة واحدة في المحرك)
+        positions = engine.top_rated(num_recommendations, exclude=selected_idx)
+        scores = engine.scores(selected_idx)[positions]
+    
+    elif recommendation_type == "يُشترى معه عادةً":
+        # المنتجات المرتبطة مرتبة مسبقاً في الفهرس حسب الثقة
+        index = load_bought_together_index()
+        consequent_ids, _, _ = index.lookup(selected_product['ProductID'])
+        
+        positions = engine.positions_of(consequent_ids)
+        positions = positions[(positions >= 0) & (positions != selected_idx)][:num_recommendations]
+        scores = engine.scores(selected_idx)[positions]
+    
+    elif recommendation_type == "متقاربة الخصائص":
+        # أقرب الجيران في الخصائص المطبعة من الفهرس التقريبي المحفوظ على القرص
+        ann_index = load_or_build_ann_index(df)
+        positions, _ = ann_index.search_product(selected_idx, num_recommendations)
+        scores = engine.scores(selected_idx)[positions]
+    
+    elif recommendation_type == "من نفس العنقود":
+        # أعضاء العنقود من القوائم المقلوبة، مرتبة حسب التشابه داخل العنقود فقط
+        model = get_cluster_model(df)
+        members = model.members_of(model.cluster_of(df, selected_idx))
+        members = members[members != selected_idx]
+        
+        member_scores = engine.scores(selected_idx)[members]
+        order = np.lexsort((members, -member_scores))[:num_recommendations]
+        positions, scores = members[order], member_scores[order]
     
     else:
-        recommendations = candidates.head(num_recommendations)
+        # الأكثر تشابهاً في كل الكتالوج
+        positions, scores = engine.top_k(selected_idx, num_recommendations)
     
-    return recommendations
+    return df.iloc[positions].assign(SimilarityScore=scores)
 
 def calculate_similarity_score(product1, product2):
     """حساب نقاط التشابه بين منتجين"""
@@ -0,0 +1,234 @@
+"""فهرس تقريبي لأقرب الجيران (IVF) فوق خصائص المنتجات المطبعة
+
+الاستخدام:
+    python -m src.ann_index build
+    python -m src.ann_index benchmark --queries 500 --k 10
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from src.clustering import prepare_features
+from src.data_preprocessing import PRODUCTS_FILE, load_products
+from src.rule_store import file_fingerprint
+
+DEFAULT_INDEX_DIR = "data/processed/ann"
+ANN_FEATURES = ['Price', 'Rating', 'Stock', 'PowerWatt', 'WeightKg']
+DEFAULT_N_PROBE = 8
+
+# الفهرس المحمّل في هذه العملية
+_loaded = {}
+
+
+class IVFIndex:
+    """فهرس IVF: مراكز خشنة وقوائم متجاورة من المتجهات لكل مركز"""
+
+    def __init__(self, centroids, vectors, ids, offsets, metadata):
+        self.centroids = centroids
+        # المتجهات مرتبة حسب القائمة ليكون كل قائمة شريحة متصلة
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.metadata = metadata
+        self._row_of = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def row_of(self, product_position):
+        """موضع المنتج داخل مصفوفة المتجهات المرتبة"""
+        if self._row_of is None:
+            row_of = np.empty(len(self.ids), dtype=np.int64)
+            row_of[self.ids] = np.arange(len(self.ids))
+            self._row_of = row_of
+        return self._row_of[product_position]
+
+    def search(self, query, k=10, n_probe=DEFAULT_N_PROBE, exclude=None):
+        """أقرب K منتجات للمتجه بفحص أقرب n_probe قوائم فقط"""
+        query = np.asarray(query, dtype=np.float32)
+        n_probe = min(n_probe, self.n_lists)
+
+        centroid_distances = ((self.centroids - query) ** 2).sum(axis=1)
+        lists = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+
+        rows = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+        ])
+        distances = ((self.vectors[rows] - query) ** 2).sum(axis=1)
+        ids = self.ids[rows]
+
+        if exclude is not None:
+            distances[ids == exclude] = np.inf
+
+        k = min(k, len(ids) - (exclude is not None))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        return ids[top], np.sqrt(distances[top])
+
+    def search_product(self, product_position, k=10, n_probe=DEFAULT_N_PROBE):
+        """أقرب K منتجات لمنتج موجود في الفهرس (مع استبعاده)"""
+        query = self.vectors[self.row_of(product_position)]
+        return self.search(query, k, n_probe, exclude=product_position)
+
+    def save(self, index_dir):
+        """حفظ الفهرس كملفات npy قابلة للتحميل بالربط مع الذاكرة"""
+        tmp_dir = f"{index_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name in ('centroids', 'vectors', 'ids', 'offsets'):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        """تحميل الفهرس مع ربط المتجهات بالذاكرة دون قراءتها كاملة"""
+        mode = 'r' if mmap else None
+        arrays = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode=mode)
+            for name in ('centroids', 'vectors', 'ids', 'offsets')
+        }
+        with open(os.path.join(index_dir, "meta.json"), encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        # المراكز صغيرة وتُستخدم في كل استعلام فتُقرأ في الذاكرة
+        arrays['centroids'] = np.array(arrays['centroids'])
+        return cls(metadata=metadata, **arrays)
+
+
+def build_ivf_index(X, n_lists=None, random_state=42, metadata=None):
+    """بناء الفهرس: تدريب مراكز خشنة ثم توزيع المتجهات على القوائم"""
+    X = np.asarray(X, dtype=np.float32)
+    n_lists = n_lists or max(1, int(np.sqrt(len(X))))
+    n_lists = min(n_lists, len(X))
+
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_lists, random_state=random_state, n_init=3,
+        batch_size=min(len(X), max(1024, 4 * n_lists))
+    )
+    assignments = kmeans.fit_predict(X)
+
+    order = np.argsort(assignments, kind='stable')
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=n_lists), out=offsets[1:])
+
+    return IVFIndex(
+        kmeans.cluster_centers_.astype(np.float32),
+        X[order],
+        order.astype(np.int64),
+        offsets,
+        dict(metadata or {}, n_lists=n_lists, size=len(X))
+    )
+
+
+def _source_fingerprint():
+    """بصمة ملف المنتجات (أو 'demo' للبيانات التجريبية)"""
+    return file_fingerprint(PRODUCTS_FILE) if os.path.exists(PRODUCTS_FILE) else 'demo'
+
+
+def load_or_build_ann_index(products_df, features=None, index_dir=DEFAULT_INDEX_DIR):
+    """تحميل الفهرس المحفوظ إذا كان مطابقاً للبيانات، وإلا بناؤه وحفظه"""
+    features = [f for f in (features or ANN_FEATURES) if f in products_df.columns]
+    source = _source_fingerprint()
+
+    cached = _loaded.get(index_dir)
+    if cached is not None and cached.metadata.get('source') == source and cached.metadata.get('features') == features:
+        return cached
+
+    meta_path = os.path.join(index_dir, "meta.json")
+    index = None
+    if os.path.exists(meta_path):
+        index = IVFIndex.load(index_dir)
+        if index.metadata.get('source') != source or index.metadata.get('features') != features \
+                or index.metadata.get('size') != len(products_df):
+            index = None
+
+    if index is None:
+        X, mean, scale = prepare_features(products_df, features, dtype=np.float32)
+        index = build_ivf_index(X, metadata={
+            'source': source,
+            'features': features,
+            'mean': mean.tolist(),
+            'scale': scale.tolist()
+        })
+        index.save(index_dir)
+        index = IVFIndex.load(index_dir)
+
+    _loaded[index_dir] = index
+    return index
+
+
+def benchmark_recall(index, X, k=10, n_queries=200, n_probes=(1, 2, 4, 8, 16, 32), random_state=0):
+    """مقارنة الاستدعاء وزمن الاستعلام مع البحث الشامل الدقيق"""
+    X = np.asarray(X, dtype=np.float32)
+    rng = np.random.default_rng(random_state)
+    queries = rng.choice(len(X), size=min(n_queries, len(X)), replace=False)
+
+    # الحل الدقيق بالبحث الشامل
+    started = time.perf_counter()
+    exact = []
+    for q in queries:
+        distances = ((X - X[q]) ** 2).sum(axis=1)
+        distances[q] = np.inf
+        kk = min(k, len(X) - 1)
+        exact.append(set(np.argpartition(distances, kk - 1)[:kk].tolist()))
+    brute_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    results = []
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            break
+        started = time.perf_counter()
+        found = [index.search_product(q, k, n_probe)[0] for q in queries]
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        recall = np.mean([
+            len(truth.intersection(ids.tolist())) / max(1, len(truth))
+            for truth, ids in zip(exact, found)
+        ])
+        results.append({
+            'n_probe': n_probe,
+            'recall': round(float(recall), 4),
+            'ms_per_query': round(elapsed_ms, 4),
+            'brute_force_ms_per_query': round(brute_ms, 4)
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="فهرس أقرب الجيران التقريبي للمنتجات")
+    parser.add_argument('command', choices=['build', 'benchmark'])
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    products_df = load_products()
+    index = load_or_build_ann_index(products_df, index_dir=args.index_dir)
+    print(f"الفهرس: {len(index)} منتج في {index.n_lists} قائمة")
+
+    if args.command == 'benchmark':
+        X, _, _ = prepare_features(products_df, index.metadata['features'], dtype=np.float32)
+        for row in benchmark_recall(index, X, args.k, args.queries):
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""خدمة HTTP للتوصيات بنفس محركات صفحة نظام التوصية
+
+الاستخدام:
+    python -m src.api serve --port 8080
+    curl 'http://127.0.0.1:8080/recommend?product_id=5&mode=category&k=5'
+    python -m src.api loadtest --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from src.data_preprocessing import load_products
+
+# اسم الطريقة في الواجهة ← نوع التوصية في صفحة نظام التوصية
+MODES = {
+    'category': "حسب الفئة",
+    'price': "حسب السعر المشابه",
+    'rating': "حسب التقييم العالي",
+    'cluster': "من نفس العنقود",
+    'bought_together': "يُشترى معه عادةً",
+    'similar': "الأكثر تشابهاً"
+}
+
+DEFAULT_K = 5
+MAX_K = 100
+RESPONSE_COLUMNS = ['ProductID', 'ProductName', 'Category', 'Brand', 'Price', 'Rating']
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class RecommendationService:
+    """تحميل المنتجات والفهارس مرة واحدة ثم الإجابة من الذاكرة"""
+
+    def __init__(self, products_df=None):
+        from pages.recommendation_system import get_recommendations
+
+        self._get_recommendations = get_recommendations
+        self.products_df = load_products() if products_df is None else products_df
+        self._position = {
+            product_id: position for position, product_id in enumerate(self.products_df['ProductID'].tolist())
+        }
+        self._row_of_label = {label: position for position, label in enumerate(self.products_df.index.tolist())}
+
+        # جسم كل منتج في الاستجابة مجهز مسبقاً فلا يمر الطلب على pandas لبناء النتيجة
+        columns = self.products_df[RESPONSE_COLUMNS]
+        self._items = [
+            {
+                'product_id': int(product_id),
+                'name': name,
+                'category': category,
+                'brand': brand,
+                'price': round(float(price), 2),
+                'rating': round(float(rating), 1)
+            }
+            for product_id, name, category, brand, price, rating in zip(
+                *(columns[col].tolist() for col in RESPONSE_COLUMNS)
+            )
+        ]
+
+    def warm_up(self):
+        """بناء محرك التشابه ونموذج العنقدة وفهرس القواعد قبل أول طلب"""
+        for mode in MODES:
+            self.recommend(int(self.products_df['ProductID'].iat[0]), mode, 1)
+
+    def recommend(self, product_id, mode='similar', k=DEFAULT_K):
+        """أفضل K توصيات لمنتج (None إذا كان المنتج غير موجود)"""
+        position = self._position.get(product_id)
+        if position is None:
+            return None
+
+        recommendations = self._get_recommendations(self.products_df, position, MODES[mode], k)
+        return [
+            dict(self._items[self._row_of_label[label]], score=round(score, 2))
+            for label, score in zip(recommendations.index.tolist(), recommendations['SimilarityScore'].tolist())
+        ]
+
+
+def _parse_request(service, target):
+    """معالجة مسار الطلب وإرجاع (الحالة، الجسم)"""
+    url = urlsplit(target)
+    if url.path == '/health':
+        return 200, {'status': 'ok', 'products': len(service.products_df)}
+    if url.path != '/recommend':
+        return 404, {'error': 'not found'}
+
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    mode = params.get('mode', 'similar')
+    if mode not in MODES:
+        return 400, {'error': f"unknown mode '{mode}'", 'modes': list(MODES)}
+    try:
+        product_id = int(params['product_id'])
+        k = int(params.get('k', DEFAULT_K))
+    except (KeyError, ValueError):
+        return 400, {'error': 'product_id and k must be integers'}
+    if not 1 <= k <= MAX_K:
+        return 400, {'error': f'k must be between 1 and {MAX_K}'}
+
+    items = service.recommend(product_id, mode, k)
+    if items is None:
+        return 404, {'error': f'unknown product {product_id}'}
+    return 200, {'product_id': product_id, 'mode': mode, 'k': k, 'items': items}
+
+
+async def _handle_connection(service, reader, writer):
+    """اتصال HTTP/1.1 واحد مع إبقائه مفتوحاً لعدة طلبات"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            # الطلبات لا تحمل جسماً، لكن يُقرأ إن وجد حتى لا يختلط بالطلب التالي
+            try:
+                length = int(headers.get('content-length', 0) or 0)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                # لا يمكن معرفة نهاية الجسم فيُرد بخطأ ويُغلق الاتصال
+                length = None
+            if length:
+                await reader.readexactly(length)
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                break
+            method, target, version = parts
+
+            if length is None:
+                status, body = 400, {'error': 'invalid Content-Length header'}
+            elif method != 'GET':
+                status, body = 405, {'error': 'only GET is supported'}
+            else:
+                try:
+                    status, body = _parse_request(service, target)
+                except Exception as e:
+                    status, body = 500, {'error': str(e)}
+
+            keep_alive = length is not None and version == 'HTTP/1.1' \
+                and headers.get('connection', '').lower() != 'close'
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, 'Internal Server Error')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8080, service=None):
+    """تشغيل الخدمة حتى الإيقاف"""
+    service = service or RecommendationService()
+    service.warm_up()
+
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(service, reader, writer), host, port
+    )
+    print(f"خدمة التوصيات تعمل على http://{host}:{port} ({len(service.products_df)} منتج)")
+    async with server:
+        await server.serve_forever()
+
+
+async def _client(host, port, queue, latencies, errors):
+    """عميل واحد باتصال مفتوح يرسل الطلبات من الطابور"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                target = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+
+            if b' 200 ' not in status_line:
+                errors.append(status_line.decode('latin-1').strip())
+    finally:
+        writer.close()
+
+
+async def load_test(host='127.0.0.1', port=8080, n_requests=5000, concurrency=50, product_ids=None, seed=0):
+    """إرسال طلبات متزامنة بطرق عشوائية وقياس زمن الاستجابة"""
+    rng = np.random.default_rng(seed)
+    product_ids = product_ids if product_ids is not None else load_products()['ProductID'].to_numpy()
+    modes = list(MODES)
+
+    queue = asyncio.Queue()
+    for _ in range(n_requests):
+        product_id = int(rng.choice(product_ids))
+        mode = modes[rng.integers(len(modes))]
+        queue.put_nowait(f"/recommend?product_id={product_id}&mode={mode}&k={DEFAULT_K}")
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _client(host, port, queue, latencies, errors) for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'max_ms': round(float(latencies_ms.max()), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="خدمة HTTP للتوصيات")
+    parser.add_argument('command', choices=['serve', 'loadtest'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        result = asyncio.run(load_test(args.host, args.port, args.requests, args.concurrency))
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+import heapq
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.baskets import BasketCSR
+from src.invoice_bitmaps import build_invoice_bitmaps
+
+TOP_K_METRICS = ('confidence', 'lift', 'support')
+
+# أدنى دعم في وضع أفضل K: يستبعد الصدف النادرة فقط ولا يحتاج ضبطاً لكل بيانات
+TOP_K_MIN_SUPPORT = 0.001
+
+
+def build_incidence_matrix(basket_data):
+    """بناء مصفوفة الوقوع المتناثرة (فاتورة × منتج) من بيانات سلة التسوق"""
+    if isinstance(basket_data, BasketCSR):
+        return basket_data.to_incidence(), np.asarray(basket_data.product_ids)
+
+    baskets = list(basket_data.values())
+    lengths = np.fromiter((len(items) for items in baskets), dtype=np.int64, count=len(baskets))
+
+    if lengths.sum() == 0:
+        return sparse.csr_matrix((len(baskets), 0), dtype=np.int32), np.array([])
+
+    all_items = np.concatenate([np.asarray(items) for items in baskets if len(items) > 0])
+    rows = np.repeat(np.arange(len(baskets), dtype=np.int32), lengths)
+
+    # ترميز أرقام المنتجات إلى أعمدة متتالية
+    codes, product_ids = pd.factorize(all_items, sort=True)
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (rows, codes.astype(np.int32))),
+        shape=(len(baskets), len(product_ids))
+    )
+
+    # المنتج المكرر في نفس الفاتورة يُحسب مرة واحدة
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+
+    return incidence, np.asarray(product_ids)
+
+
+def compute_cooccurrence(incidence):
+    """حساب عدد الفواتير المشتركة لكل زوج من المنتجات بضرب مصفوفي واحد"""
+    incidence = incidence.tocsc()
+    return (incidence.T @ incidence).tocoo()
+
+
+def find_pair_rules(basket_data, min_support=0.1, min_confidence=0.5):
+    """استخراج قواعد (منتج ← منتج) مع الدعم والثقة والرفع"""
+    total_transactions = len(basket_data)
+    if total_transactions == 0:
+        return []
+
+    incidence, product_ids = build_incidence_matrix(basket_data)
+    item_counts = np.asarray(incidence.sum(axis=0)).ravel()
+
+    # الاحتفاظ بالمنتجات المتكررة فقط قبل الضرب لتصغير المصفوفة الناتجة
+    frequent = np.flatnonzero(item_counts >= min_support_count(min_support, total_transactions))
+    if len(frequent) < 2:
+        return []
+
+    pairs = compute_cooccurrence(incidence[:, frequent])
+    return rules_from_cooccurrence(
+        pairs, item_counts[frequent], product_ids[frequent].tolist(),
+        total_transactions, min_confidence
+    )
+
+
+def rules_from_cooccurrence(pairs, item_counts, product_ids, total_transactions, min_confidence=0.5):
+    """حساب الثقة والرفع لكل زوج من مصفوفة التكرار المشترك"""
+    pairs = pairs.tocoo()
+    off_diagonal = (pairs.row != pairs.col) & (pairs.data > 0)
+    antecedents = pairs.row[off_diagonal]
+    consequents = pairs.col[off_diagonal]
+    both_counts = pairs.data[off_diagonal]
+
+    confidence = both_counts / item_counts[antecedents]
+    support = both_counts / total_transactions
+    lift = confidence / (item_counts[consequents] / total_transactions)
+
+    keep = confidence >= min_confidence
+    antecedents, consequents = antecedents[keep], consequents[keep]
+    confidence, support, lift = confidence[keep], support[keep], lift[keep]
+
+    # ترتيب حسب الثقة ثم الرفع
+    order = np.lexsort((-lift, -confidence))
+
+    return [
+        make_rule(
+            (product_ids[antecedents[i]],),
+            (product_ids[consequents[i]],),
+            support[i], confidence[i], lift[i]
+        )
+        for i in order
+    ]
+
+
+def make_rule(antecedent_ids, consequent_ids, support, confidence, lift):
+    """بناء قاموس القاعدة بالشكل الذي تعرضه الصفحة"""
+    return {
+        'antecedent': format_itemset(antecedent_ids),
+        'consequent': format_itemset(consequent_ids),
+        'antecedent_ids': tuple(antecedent_ids),
+        'consequent_ids': tuple(consequent_ids),
+        'support': float(support),
+        'confidence': float(confidence),
+        'lift': float(lift)
+    }
+
+
+def format_itemset(item_ids):
+    """تحويل مجموعة منتجات إلى نص للعرض"""
+    return ' + '.join(f'منتج {item}' for item in item_ids)
+
+
+def min_support_count(min_support, total_transactions):
+    """تحويل نسبة الدعم الأدنى إلى عدد فواتير"""
+    # طرح هامش صغير لتفادي أخطاء التقريب في الضرب العشري
+    return max(1, math.ceil(min_support * total_transactions - 1e-9))
+
+
+class _FPNode:
+    """عقدة في شجرة FP"""
+
+    __slots__ = ('item', 'count', 'parent', 'children')
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+
+def _build_fp_tree(transactions, min_count):
+    """بناء شجرة FP من قائمة (عناصر، عدد) مع حذف العناصر غير المتكررة"""
+    counts = Counter()
+    for items, count in transactions:
+        for item in items:
+            counts[item] += count
+
+    supports = {item: count for item, count in counts.items() if count >= min_count}
+    if not supports:
+        return {}, supports, []
+
+    # ترتيب العناصر تنازلياً حسب الدعم ليكون للمسارات أطول بادئة مشتركة
+    order = sorted(supports, key=lambda item: (-supports[item], item))
+    rank = {item: r for r, item in enumerate(order)}
+
+    root = _FPNode(None, None)
+    header = {item: [] for item in order}
+
+    for items, count in transactions:
+        node = root
+        for item in sorted((it for it in items if it in rank), key=rank.__getitem__):
+            child = node.children.get(item)
+            if child is None:
+                child = _FPNode(item, node)
+                node.children[item] = child
+                header[item].append(child)
+            child.count += count
+            node = child
+
+    return header, supports, order
+
+
+def _fp_growth(transactions, min_count, suffix, max_len, blocked=None):
+    """التنقيب العودي في الشجرة الشرطية لكل عنصر (blocked: عنصر ← عناصر لا تجتمع معه)"""
+    header, supports, order = _build_fp_tree(transactions, min_count)
+
+    # البدء بالعناصر الأقل تكراراً
+    for item in reversed(order):
+        itemset = suffix + (item,)
+        yield itemset, supports[item]
+
+        if max_len is not None and len(itemset) >= max_len:
+            continue
+
+        # قاعدة الأنماط الشرطية: المسارات من الجذر حتى كل ظهور للعنصر
+        pattern_base = []
+        for node in header[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            # حذف العناصر الممنوعة مع العنصر من قاعدته الشرطية فلا تُولد أي مجموعة تجمعهما
+            if blocked is not None and item in blocked:
+                path = [other for other in path if other not in blocked[item]]
+            if path:
+                pattern_base.append((path, node.count))
+
+        if pattern_base:
+            yield from _fp_growth(pattern_base, min_count, itemset, max_len, blocked)
+
+
+def find_frequent_itemsets(basket_data, min_support=0.1, max_len=None, exclusive=None):
+    """استخراج كل المجموعات المتكررة بأي طول باستخدام خوارزمية FP-Growth
+
+    exclusive قاموس اختياري (منتج ← منتجات لا تجتمع معه في مجموعة واحدة)، متماثل
+    في الاتجاهين، ويُطبق أثناء بناء القواعد الشرطية.
+    """
+    total_transactions = len(basket_data)
+    if total_transactions == 0:
+        return {}
+
+    min_count = min_support_count(min_support, total_transactions)
+
+    # ترميز المنتجات وحذف غير المتكرر منها قبل بناء الشجرة
+    incidence, product_ids = build_incidence_matrix(basket_data)
+    item_counts = np.asarray(incidence.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(item_counts >= min_count)
+    incidence = incidence[:, frequent].tocsr()
+    product_ids = product_ids[frequent].tolist()
+
+    # دمج الفواتير المتطابقة لتقليل حجم الشجرة
+    indptr, codes = incidence.indptr, incidence.indices.tolist()
+    transactions = Counter(
+        tuple(codes[indptr[row]:indptr[row + 1]])
+        for row in range(incidence.shape[0])
+        if indptr[row + 1] > indptr[row]
+    )
+
+    blocked = None
+    if exclusive:
+        code_of = {product_id: code for code, product_id in enumerate(product_ids)}
+        blocked = {
+            code_of[product_id]: {code_of[other] for other in others if other in code_of}
+            for product_id, others in exclusive.items()
+            if product_id in code_of
+        }
+
+    return {
+        frozenset(product_ids[code] for code in itemset): count
+        for itemset, count in _fp_growth(list(transactions.items()), min_count, (), max_len, blocked)
+    }
+
+
+def _merge_consequents(consequents, itemset_size):
+    """توليد النتائج المرشحة الأكبر بعنصر واحد (على طريقة Apriori)"""
+    passed = set(consequents)
+    candidates = set()
+    for first in consequents:
+        for second in consequents:
+            union = first | second
+            if len(union) == len(first) + 1 and len(union) < itemset_size:
+                # كل مجموعة جزئية يجب أن تكون قد اجتازت حد الثقة
+                if all(union - {item} in passed for item in union):
+                    candidates.add(union)
+    return list(candidates)
+
+
+def generate_rules(itemsets, total_transactions, min_confidence=0.5):
+    """توليد القواعد من المجموعات المتكررة (مقدمة ونتيجة بأي طول)"""
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+
+        support = count / total_transactions
+        consequents = [frozenset([item]) for item in itemset]
+
+        while consequents:
+            passed = []
+            for consequent in consequents:
+                antecedent = itemset - consequent
+                confidence = count / itemsets[antecedent]
+                if confidence < min_confidence:
+                    continue
+                passed.append(consequent)
+                lift = confidence / (itemsets[consequent] / total_transactions)
+                yield make_rule(sorted(antecedent), sorted(consequent), support, confidence, lift)
+
+            consequents = _merge_consequents(passed, len(itemset))
+
+
+def sort_rules(rules):
+    """ترتيب القواعد حسب الثقة ثم الرفع (ثم المنتجات لثبات الترتيب)"""
+    return sorted(
+        rules,
+        key=lambda rule: (-rule['confidence'], -rule['lift'], rule['antecedent_ids'], rule['consequent_ids'])
+    )
+
+
+def mine_association_rules(basket_data, min_support=0.1, min_confidence=0.5, max_len=None):
+    """استخراج قواعد الارتباط متعددة المستويات كمولّد"""
+    itemsets = find_frequent_itemsets(basket_data, min_support, max_len)
+    yield from generate_rules(itemsets, len(basket_data), min_confidence)
+
+
+class _TopKRules:
+    """كومة محدودة بأفضل K قواعد مع رفع حدي الدعم والثقة كلما امتلأت"""
+
+    def __init__(self, k, metric, min_count, total_transactions, count_of):
+        self.k = k
+        self.metric = metric
+        self.min_count = min_count
+        self.min_confidence = 0.0
+        self.total_transactions = total_transactions
+        self._count_of = count_of
+        self._heap = []
+        self._seen = 0
+
+    def _key(self, rule):
+        # المعيار المختار أولاً ثم الدعم والثقة لفك التعادل
+        return (rule[self.metric], rule['support'], rule['confidence'])
+
+    def push(self, rule):
+        """إضافة قاعدة إذا كانت أفضل من أضعف قاعدة في الكومة"""
+        self._seen += 1
+        entry = (self._key(rule), -self._seen, rule)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            return
+
+        if len(self._heap) == self.k:
+            weakest = self._heap[0][2]
+            # لا يمكن لقاعدة أقل من أضعف قاعدة في المعيار نفسه أن تدخل الكومة
+            if self.metric == 'support':
+                self.min_count = max(self.min_count, round(weakest['support'] * self.total_transactions))
+            elif self.metric == 'confidence':
+                self.min_confidence = max(self.min_confidence, weakest['confidence'])
+
+    def add_itemset(self, itemset, count):
+        """توليد قواعد مجموعة متكررة مع حذف النتائج التي لا تبلغ حد الثقة الحالي"""
+        support = count / self.total_transactions
+        consequents = [frozenset([item]) for item in itemset]
+
+        while consequents:
+            passed = []
+            for consequent in consequents:
+                confidence = count / self._count_of(itemset - consequent)
+                # الثقة لا تزيد عند نقل عنصر من المقدمة إلى النتيجة فيُوقف التوسيع هنا
+                if confidence < self.min_confidence:
+                    continue
+                passed.append(consequent)
+                lift = confidence / (self._count_of(consequent) / self.total_transactions)
+                self.push(make_rule(sorted(itemset - consequent), sorted(consequent), support, confidence, lift))
+
+            consequents = _merge_consequents(passed, len(itemset))
+
+    def rules(self):
+        """القواعد من الأفضل إلى الأسوأ"""
+        return [rule for _, _, rule in sorted(self._heap, reverse=True)]
+
+
+def _top_k_growth(transactions, top_k, product_ids, suffix, max_len):
+    """FP-Growth بحد دعم يُقرأ من الكومة عند كل شجرة شرطية فيرتفع أثناء البحث"""
+    header, supports, order = _build_fp_tree(transactions, top_k.min_count)
+
+    # البدء بالعناصر الأكثر تكراراً حتى تمتلئ الكومة بقواعد قوية مبكراً
+    for item in order:
+        if supports[item] < top_k.min_count:
+            break
+
+        itemset = suffix + (item,)
+        if len(itemset) >= 2:
+            top_k.add_itemset(frozenset(product_ids[code] for code in itemset), supports[item])
+
+        if max_len is not None and len(itemset) >= max_len:
+            continue
+
+        pattern_base = []
+        for node in header[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                pattern_base.append((path, node.count))
+
+        if pattern_base:
+            _top_k_growth(pattern_base, top_k, product_ids, itemset, max_len)
+
+
+def find_top_k_rules(basket_data, k=50, metric='confidence', max_len=3, min_support=TOP_K_MIN_SUPPORT,
+                     bitmap_index=None):
+    """أفضل K قواعد حسب معيار واحد دون حدود دعم وثقة يدوية (min_support حد أدنى للضوضاء فقط)"""
+    if metric not in TOP_K_METRICS:
+        raise ValueError(f"معيار ترتيب غير مدعوم: {metric}")
+
+    total_transactions = len(basket_data)
+    if total_transactions == 0 or k <= 0:
+        return []
+
+    min_count = min_support_count(min_support, total_transactions)
+
+    # المنتج الأقل من الحد الأدنى لا يدخل أي قاعدة فيُحذف قبل بناء الشجرة
+    incidence, product_ids = build_incidence_matrix(basket_data)
+    item_counts = np.asarray(incidence.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(item_counts >= min_count)
+    incidence = incidence[:, frequent].tocsr()
+    product_ids = product_ids[frequent].tolist()
+
+    # دعم المقدمات والنتائج من فهرس الفواتير بدلاً من المرور على كل السلال
+    if bitmap_index is None:
+        bitmap_index = build_invoice_bitmaps(BasketCSR(
+            incidence.indptr.astype(np.int32), incidence.indices.astype(np.int32),
+            np.arange(total_transactions), np.asarray(product_ids)
+        ))
+    counts = {}
+
+    def count_of(itemset):
+        count = counts.get(itemset)
+        if count is None:
+            count = counts[itemset] = bitmap_index.support_count(sorted(itemset))
+        return count
+
+    top_k = _TopKRules(k, metric, min_count, total_transactions, count_of)
+
+    indptr, codes = incidence.indptr, incidence.indices.tolist()
+    transactions = Counter(
+        tuple(codes[indptr[row]:indptr[row + 1]])
+        for row in range(incidence.shape[0])
+        if indptr[row + 1] - indptr[row] >= 2
+    )
+    _top_k_growth(list(transactions.items()), top_k, product_ids, (), max_len)
+    return top_k.rules()
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class BasketCSR:
+    """سلال التسوق بصيغة CSR مضغوطة: إزاحات int32 وأكواد منتجات int32"""
+
+    __slots__ = ('indptr', 'codes', 'invoice_ids', 'product_ids')
+
+    def __init__(self, indptr, codes, invoice_ids, product_ids):
+        self.indptr = indptr
+        self.codes = codes
+        self.invoice_ids = invoice_ids
+        # كود المنتج ← رقم المنتج الأصلي
+        self.product_ids = product_ids
+
+    def __len__(self):
+        return len(self.invoice_ids)
+
+    @property
+    def n_items(self):
+        return len(self.product_ids)
+
+    def basket(self, i):
+        """أكواد منتجات الفاتورة رقم i (بدون نسخ)"""
+        return self.codes[self.indptr[i]:self.indptr[i + 1]]
+
+    def item_counts(self):
+        """عدد الفواتير التي تحتوي كل منتج"""
+        return np.bincount(self.codes, minlength=self.n_items)
+
+    def to_incidence(self):
+        """مصفوفة الوقوع (فاتورة × منتج) فوق نفس المصفوفات دون نسخها"""
+        return sparse.csr_matrix(
+            (np.ones(len(self.codes), dtype=np.int32), self.codes, self.indptr),
+            shape=(len(self), self.n_items)
+        )
+
+    def to_dict(self):
+        """التحويل إلى قاموس (فاتورة ← قائمة منتجات) بالشكل القديم"""
+        product_ids = np.asarray(self.product_ids)
+        return {
+            invoice_id: product_ids[self.basket(i)].tolist()
+            for i, invoice_id in enumerate(self.invoice_ids.tolist())
+        }
+
+
+class _BasketBuilder:
+    """تجميع السلال دفعة بعد دفعة مع ترميز المنتجات بقاموس مشترك"""
+
+    def __init__(self):
+        self._codes = {}
+        self._product_ids = []
+        self._lengths = []
+        self._code_chunks = []
+        self._invoice_chunks = []
+
+    def _encode(self, products):
+        """ترميز أرقام المنتجات مع إضافة الجديدة إلى نهاية القاموس"""
+        uniques, inverse = np.unique(products, return_inverse=True)
+        mapped = np.empty(len(uniques), dtype=np.int32)
+        for i, product_id in enumerate(uniques.tolist()):
+            code = self._codes.get(product_id)
+            if code is None:
+                code = len(self._product_ids)
+                self._codes[product_id] = code
+                self._product_ids.append(product_id)
+            mapped[i] = code
+        return mapped[inverse]
+
+    def add(self, invoice_ids, products):
+        """إضافة أسطر فواتير متجاورة (كل فاتورة في تسلسل واحد)"""
+        if len(invoice_ids) == 0:
+            return
+
+        # رقم تسلسلي لكل مجموعة أسطر متتالية من نفس الفاتورة
+        starts = np.flatnonzero(np.r_[True, invoice_ids[1:] != invoice_ids[:-1]])
+        runs = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(invoice_ids)]))
+        codes = self._encode(products)
+
+        # حذف المنتج المكرر داخل نفس الفاتورة
+        order = np.lexsort((codes, runs))
+        runs, codes = runs[order], codes[order]
+        keep = np.r_[True, (runs[1:] != runs[:-1]) | (codes[1:] != codes[:-1])]
+        runs, codes = runs[keep], codes[keep]
+
+        self._lengths.append(np.bincount(runs, minlength=len(starts)))
+        self._code_chunks.append(codes)
+        self._invoice_chunks.append(np.asarray(invoice_ids)[starts])
+
+    def build(self):
+        """دمج الدفعات في بنية CSR واحدة"""
+        if not self._lengths:
+            return BasketCSR(
+                np.zeros(1, dtype=np.int32), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.int64), np.array([])
+            )
+
+        lengths = np.concatenate(self._lengths)
+        if lengths.sum() > np.iinfo(np.int32).max:
+            raise OverflowError("عدد الأسطر يتجاوز حد الإزاحات int32")
+
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=indptr[1:])
+        baskets = BasketCSR(
+            indptr,
+            np.concatenate(self._code_chunks).astype(np.int32, copy=False),
+            np.concatenate(self._invoice_chunks),
+            np.asarray(self._product_ids)
+        )
+        return _merge_split_invoices(baskets)
+
+
+def _merge_split_invoices(baskets):
+    """دمج الفواتير التي ظهرت أسطرها في أكثر من موضع في الملف"""
+    invoice_ids = baskets.invoice_ids
+    uniques, first, inverse = np.unique(invoice_ids, return_index=True, return_inverse=True)
+    if len(uniques) == len(invoice_ids):
+        return baskets
+
+    lengths = np.diff(baskets.indptr)
+    rows = np.repeat(inverse, lengths)
+    codes = baskets.codes
+
+    order = np.lexsort((codes, rows))
+    rows, codes = rows[order], codes[order]
+    keep = np.r_[True, (rows[1:] != rows[:-1]) | (codes[1:] != codes[:-1])]
+    rows, codes = rows[keep], codes[keep]
+
+    # الحفاظ على ترتيب أول ظهور لكل فاتورة
+    position = np.empty(len(uniques), dtype=np.int64)
+    position[np.argsort(first, kind='stable')] = np.arange(len(uniques))
+    rows = position[rows]
+    order = np.argsort(rows, kind='stable')
+    rows, codes = rows[order], codes[order]
+
+    indptr = np.zeros(len(uniques) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=len(uniques)), out=indptr[1:])
+    return BasketCSR(indptr, codes, uniques[np.argsort(first, kind='stable')], baskets.product_ids)
+
+
+def baskets_from_frame(invoices_df):
+    """بناء سلال CSR من جدول فواتير محمّل"""
+    ordered = invoices_df.sort_values('InvoiceID', kind='stable')
+    builder = _BasketBuilder()
+    builder.add(ordered['InvoiceID'].to_numpy(), ordered['ProductID'].to_numpy())
+    return builder.build()
+
+
+def _iter_chunks(path, chunk_rows):
+    """قراءة (InvoiceID, ProductID) على دفعات من CSV أو Parquet"""
+    columns = ['InvoiceID', 'ProductID']
+
+    if path.endswith('.csv'):
+        for chunk in pd.read_csv(path, usecols=columns, dtype='int32', chunksize=chunk_rows):
+            yield chunk['InvoiceID'].to_numpy(), chunk['ProductID'].to_numpy()
+        return
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+        yield (
+            batch.column('InvoiceID').to_numpy(zero_copy_only=False),
+            batch.column('ProductID').to_numpy(zero_copy_only=False)
+        )
+
+
+def stream_baskets(path, chunk_rows=1_000_000):
+    """بناء سلال CSR من ملف فواتير أكبر من الذاكرة بقراءته على دفعات"""
+    builder = _BasketBuilder()
+    carry_invoices = np.empty(0, dtype=np.int32)
+    carry_products = np.empty(0, dtype=np.int32)
+
+    for invoice_ids, products in _iter_chunks(path, chunk_rows):
+        if len(invoice_ids) == 0:
+            continue
+
+        invoice_ids = np.concatenate([carry_invoices, invoice_ids])
+        products = np.concatenate([carry_products, products])
+
+        # الفاتورة الأخيرة قد تكمل في الدفعة التالية فتؤجل
+        different = np.flatnonzero(invoice_ids != invoice_ids[-1])
+        last_start = different[-1] + 1 if len(different) else 0
+
+        builder.add(invoice_ids[:last_start], products[:last_start])
+        carry_invoices = invoice_ids[last_start:]
+        carry_products = products[last_start:]
+
+    builder.add(carry_invoices, carry_products)
+    return builder.build()
@@ -0,0 +1,253 @@
+"""قياس أداء المسارات الساخنة على بيانات اصطناعية بأحجام مختلفة
+
+الاستخدام:
+    python -m src.benchmark run --scales 1000 10000 100000
+    python -m src.benchmark run --save-baseline
+    python -m src.benchmark compare
+    python -m src.benchmark generate --rows 1000000
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import PRODUCTS_DTYPES, INVOICES_DTYPES
+
+DEFAULT_BENCHMARK_DIR = "data/processed/benchmarks"
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+
+# معاملات ثابتة حتى تكون النتائج قابلة للمقارنة بين التشغيلات
+RULES_MIN_SUPPORT = 0.01
+RULES_MIN_CONFIDENCE = 0.1
+CLUSTER_FEATURES = ['Price', 'Rating']
+N_CLUSTERS = 3
+N_QUERIES = 50
+N_PAIRS = 1_000
+RECOMMENDATION_MODES = ["حسب الفئة", "حسب السعر المشابه", "حسب التقييم العالي", "الأكثر تشابهاً"]
+
+# التباطؤ المسموح قبل اعتبار النتيجة تراجعاً في الأداء
+DEFAULT_TOLERANCE = 0.2
+
+CATEGORIES = ['Accessories', 'Storage', 'Electronics', 'Furniture', 'Networking', 'Audio', 'Lighting', 'Office']
+BRANDS = ['Sony', 'Samsung', 'Belkin', 'Logitech', 'LG', 'WD', 'SanDisk', 'Razer', 'IKEA', 'Philips', 'Anker', 'TP-Link']
+
+
+def generate_products(n_products, seed=0):
+    """جدول منتجات اصطناعي بنفس أعمدة ملف المنتجات"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'ProductID': np.arange(1, n_products + 1),
+        'ProductName': [f"Product {i}" for i in range(1, n_products + 1)],
+        'Brand': rng.choice(BRANDS, n_products),
+        'Category': rng.choice(CATEGORIES, n_products),
+        'Price': np.round(rng.lognormal(4, 1, n_products), 2),
+        'Rating': np.round(rng.uniform(1, 5, n_products), 1),
+        'Stock': rng.integers(0, 250, n_products),
+        'PowerWatt': rng.choice([0, 2, 5, 20, 30, 60], n_products),
+        'WeightKg': np.round(rng.gamma(2, 1.5, n_products), 2)
+    }).astype(PRODUCTS_DTYPES)
+
+
+def generate_invoices(n_rows, n_products, mean_basket=4, seed=0):
+    """أسطر فواتير اصطناعية: أحجام سلال بتوزيع بواسون وشعبية منتجات بتوزيع Zipf"""
+    rng = np.random.default_rng(seed)
+
+    sizes = np.maximum(1, rng.poisson(mean_basket, n_rows // mean_basket + 1))
+    # السحب الأول قد لا يغطي كل الأسطر: متابعة السحب حتى يبلغ مجموع الأحجام n_rows
+    while sizes.sum() < n_rows:
+        missing = n_rows - sizes.sum()
+        sizes = np.r_[sizes, np.maximum(1, rng.poisson(mean_basket, missing // mean_basket + 1))]
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), n_rows) + 1]
+    invoice_ids = np.repeat(np.arange(1, len(sizes) + 1), sizes)[:n_rows]
+
+    # المنتجات الأولى أكثر شيوعاً فتظهر مجموعات متكررة كما في البيانات الحقيقية
+    product_ids = (rng.zipf(1.5, n_rows) - 1) % n_products + 1
+    return pd.DataFrame({
+        'InvoiceID': invoice_ids,
+        'ProductID': product_ids,
+        'Quantity': rng.integers(1, 4, n_rows)
+    }).astype(INVOICES_DTYPES)
+
+
+def _measure(run, repeat, memory):
+    """أقل زمن من عدة تشغيلات، ثم تشغيل واحد لقياس أعلى استهلاك للذاكرة"""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - started)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return min(seconds), peak_mb
+
+
+def _benchmarks(products_df, invoices_df, seed=0):
+    """المسارات المقاسة: (الاسم، الدالة، عدد الوحدات المعالجة، الوحدة)"""
+    from pages.association_rules import create_basket_data, find_simple_rules
+    from src.clustering import perform_clustering
+    from pages.recommendation_system import calculate_similarity_score, get_recommendations
+
+    rng = np.random.default_rng(seed)
+    basket_data = create_basket_data(invoices_df)
+    queries = rng.integers(0, len(products_df), N_QUERIES)
+    pairs = rng.integers(0, len(products_df), (N_PAIRS, 2))
+    row_of = {position: products_df.iloc[position] for position in np.unique(pairs).tolist()}
+
+    def recommend():
+        for i, position in enumerate(queries.tolist()):
+            get_recommendations(products_df, position, RECOMMENDATION_MODES[i % len(RECOMMENDATION_MODES)], 5)
+
+    def similarity():
+        for first, second in pairs.tolist():
+            calculate_similarity_score(row_of[first], row_of[second])
+
+    return [
+        ('create_basket_data', lambda: create_basket_data(invoices_df), len(invoices_df), 'rows/s'),
+        ('find_simple_rules', lambda: find_simple_rules(basket_data, RULES_MIN_SUPPORT, RULES_MIN_CONFIDENCE),
+         len(basket_data), 'invoices/s'),
+        ('perform_clustering', lambda: perform_clustering(products_df, CLUSTER_FEATURES, N_CLUSTERS),
+         len(products_df), 'products/s'),
+        ('get_recommendations', recommend, N_QUERIES, 'queries/s'),
+        ('calculate_similarity_score', similarity, N_PAIRS, 'pairs/s')
+    ]
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, names=None, repeat=3, memory=True, seed=0, log=print):
+    """تشغيل كل المسارات على كل حجم وإرجاع النتائج"""
+    results = []
+    for scale in scales:
+        products_df = generate_products(scale, seed)
+        invoices_df = generate_invoices(scale, scale, seed=seed)
+
+        for name, run, units, unit in _benchmarks(products_df, invoices_df, seed):
+            if names and name not in names:
+                continue
+            seconds, peak_mb = _measure(run, repeat, memory)
+            result = {
+                'benchmark': name,
+                'scale': scale,
+                'seconds': seconds,
+                'throughput': units / seconds if seconds > 0 else None,
+                'unit': unit,
+                'peak_mb': peak_mb
+            }
+            results.append(result)
+            if log:
+                log(f"{name:<28} {scale:>10,} {seconds * 1000:12.2f} ms "
+                    f"{result['throughput'] or 0:14,.0f} {unit:<11} "
+                    f"{'' if peak_mb is None else f'{peak_mb:9.1f} MB'}")
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'cpu_count': os.cpu_count(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """مقارنة زمن كل مسار مع خط الأساس (النسبة > 1 تعني أبطأ)"""
+    base = {(r['benchmark'], r['scale']): r for r in baseline['results']}
+    rows = []
+    for result in report['results']:
+        reference = base.get((result['benchmark'], result['scale']))
+        if reference is None:
+            continue
+        ratio = result['seconds'] / reference['seconds'] if reference['seconds'] > 0 else None
+        rows.append({
+            'benchmark': result['benchmark'],
+            'scale': result['scale'],
+            'baseline_seconds': reference['seconds'],
+            'seconds': result['seconds'],
+            'ratio': ratio,
+            'regression': ratio is not None and ratio > 1 + tolerance
+        })
+    return rows
+
+
+def save_report(path, report):
+    """حفظ التقرير كملف JSON"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_report(path):
+    """تحميل تقرير محفوظ"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _print_comparison(rows):
+    for row in rows:
+        flag = "  << تراجع" if row['regression'] else ""
+        print(f"{row['benchmark']:<28} {row['scale']:>10,} "
+              f"{row['baseline_seconds'] * 1000:12.2f} → {row['seconds'] * 1000:12.2f} ms "
+              f"(x{row['ratio']:.2f}){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء التنقيب والعنقدة والتوصية")
+    parser.add_argument('command', choices=['run', 'compare', 'generate'])
+    parser.add_argument('--scales', nargs='+', type=int, default=list(DEFAULT_SCALES))
+    parser.add_argument('--benchmarks', nargs='+', help="تشغيل مسارات محددة فقط")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="تخطي قياس الذاكرة")
+    parser.add_argument('--dir', default=DEFAULT_BENCHMARK_DIR)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--rows', type=int, default=100_000, help="حجم البيانات المولدة")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    latest_path = os.path.join(args.dir, "latest.json")
+    baseline_path = os.path.join(args.dir, "baseline.json")
+
+    if args.command == 'generate':
+        out_dir = os.path.join(args.dir, f"synthetic_{args.rows}")
+        os.makedirs(out_dir, exist_ok=True)
+        generate_products(args.rows, args.seed).to_csv(os.path.join(out_dir, "products.csv"), index=False)
+        generate_invoices(args.rows, args.rows, seed=args.seed).to_csv(
+            os.path.join(out_dir, "invoices.csv"), index=False
+        )
+        print(f"تم حفظ البيانات في {out_dir}")
+        return
+
+    if args.command == 'run':
+        report = run_benchmarks(args.scales, args.benchmarks, args.repeat, not args.no_memory, args.seed)
+        save_report(latest_path, report)
+        if args.save_baseline:
+            save_report(baseline_path, report)
+            print(f"تم حفظ خط الأساس في {baseline_path}")
+    else:
+        report = load_report(latest_path)
+
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        rows = compare(report, load_report(baseline_path), args.tolerance)
+        _print_comparison(rows)
+        if any(row['regression'] for row in rows):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from src.tracing import traced
+
+DEFAULT_MODEL_PATH = "data/processed/clusters/cluster_model.npz"
+
+# النموذج المحمّل حسب (المسار، وقت التعديل)
+_loaded = {}
+
+
+def prepare_features(df, features, dtype=np.float64):
+    """تجهيز مصفوفة الخصائص المطبعة (تعويض القيم المفقودة بالمتوسط ثم التطبيع)"""
+    X = df[features].to_numpy(dtype=np.float64, copy=True)
+
+    # معالجة القيم المفقودة
+    mean = np.nanmean(X, axis=0)
+    missing = np.isnan(X)
+    if missing.any():
+        X[missing] = np.take(mean, np.nonzero(missing)[1])
+
+    # تطبيع البيانات (نفس StandardScaler: الانحراف الصفري يصبح 1)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    X_scaled = ((X - mean) / scale).astype(dtype, copy=False)
+
+    return X_scaled, mean, scale
+
+
+class ClusterModel:
+    """نموذج عنقدة محفوظ: معاملات التطبيع والمراكز وعنقود كل منتج وأعضاء كل عنقود"""
+
+    def __init__(self, features, mean, scale, centroids, labels, product_ids):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.product_ids = np.asarray(product_ids)
+
+        # القوائم المقلوبة: أعضاء كل عنقود كشريحة متصلة
+        self.members = np.argsort(self.labels, kind='stable').astype(np.int32)
+        self.member_offsets = np.zeros(self.n_clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.labels, minlength=self.n_clusters), out=self.member_offsets[1:])
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    def members_of(self, cluster):
+        """مواضع منتجات العنقود (بدون نسخ)"""
+        return self.members[self.member_offsets[cluster]:self.member_offsets[cluster + 1]]
+
+    def assign(self, df):
+        """تحديد عنقود منتجات جديدة بأقرب مركز دون إعادة التدريب"""
+        X = df[self.features].to_numpy(dtype=np.float64, copy=True)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.take(self.mean, np.nonzero(missing)[1])
+        X = (X - self.mean) / self.scale
+
+        distances = ((X[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1).astype(np.int32)
+
+    def matches(self, df):
+        """هل بُني النموذج على نفس منتجات الجدول وبنفس الترتيب؟"""
+        return 'ProductID' in df.columns and len(df) == len(self.product_ids) \
+            and np.array_equal(df['ProductID'].to_numpy(), self.product_ids)
+
+    def for_frame(self, df):
+        """نفس المراكز مع عناقيد وأعضاء بمواضع الجدول الحالي (مطابقة بأرقام المنتجات)"""
+        if self.matches(df):
+            return self
+
+        labels = self.assign(df)
+        if 'ProductID' not in df.columns:
+            return ClusterModel(self.features, self.mean, self.scale, self.centroids, labels, np.arange(len(df)))
+
+        # المنتج المعروف يحتفظ بعنقوده من التدريب، والجديد يأخذ أقرب مركز
+        product_ids = df['ProductID'].to_numpy()
+        known = pd.Index(self.product_ids).get_indexer(product_ids)
+        labels[known >= 0] = self.labels[known[known >= 0]]
+        return ClusterModel(self.features, self.mean, self.scale, self.centroids, labels, product_ids)
+
+    def cluster_of(self, df, position):
+        """عنقود المنتج في الموضع المعطى (من النموذج إن كان معروفاً، وإلا بأقرب مركز)"""
+        if 'ProductID' in df.columns and position < len(self.product_ids) \
+                and df['ProductID'].iat[position] == self.product_ids[position]:
+            return int(self.labels[position])
+        return int(self.assign(df.iloc[[position]])[0])
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        """حفظ النموذج كملف npz"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                features=np.array(self.features),
+                mean=self.mean,
+                scale=self.scale,
+                centroids=self.centroids,
+                labels=self.labels,
+                product_ids=self.product_ids
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """تحميل نموذج محفوظ"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['features'].tolist(), data['mean'], data['scale'],
+                data['centroids'], data['labels'], data['product_ids']
+            )
+
+
+def build_cluster_model(df, features, labels, centroids):
+    """تجميع نتائج K-Means في نموذج قابل للحفظ"""
+    _, mean, scale = prepare_features(df, features)
+    product_ids = df['ProductID'].to_numpy() if 'ProductID' in df.columns else np.arange(len(df))
+    return ClusterModel(features, mean, scale, centroids, labels, product_ids)
+
+
+def load_cluster_model(path=DEFAULT_MODEL_PATH):
+    """تحميل النموذج المحفوظ مرة واحدة حتى يتغير الملف (أو None إذا لم يوجد)"""
+    if not os.path.exists(path):
+        return None
+
+    version = os.stat(path).st_mtime_ns
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, ClusterModel.load(path))
+        _loaded[path] = cached
+    return cached[1]
+
+
+def save_cluster_model(df, features, clusters, cluster_centers, path=DEFAULT_MODEL_PATH):
+    """حفظ نموذج العنقدة (المراكز ومعاملات التطبيع وعنقود كل منتج)"""
+    model = build_cluster_model(df, features, clusters, cluster_centers)
+    model.save(path)
+    return model
+
+
+def iter_frame_chunks(df, chunk_rows=100_000):
+    """تقسيم جدول محمّل إلى أجزاء"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_file_chunks(path, features, chunk_rows=100_000):
+    """قراءة أعمدة الخصائص فقط من ملف منتجات (CSV أو Parquet) على دفعات"""
+    columns = list(features) + ['ProductID']
+
+    if path.endswith('.csv'):
+        header = pd.read_csv(path, nrows=0).columns
+        usecols = [c for c in columns if c in header]
+        yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_rows)
+        return
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    usecols = [c for c in columns if c in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=usecols):
+        yield batch.to_pandas()
+
+
+def streaming_feature_stats(chunks, features):
+    """المتوسط والانحراف المعياري لكل خاصية في مرور واحد دون تحميل الجدول"""
+    n_rows = 0
+    count = np.zeros(len(features))
+    total = np.zeros(len(features))
+    total_sq = np.zeros(len(features))
+
+    for chunk in chunks:
+        X = chunk[features].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(X)
+        n_rows += len(X)
+        count += valid.sum(axis=0)
+        X = np.where(valid, X, 0)
+        total += X.sum(axis=0)
+        total_sq += (X ** 2).sum(axis=0)
+
+    mean = total / np.maximum(count, 1)
+    # القيم المفقودة تُعوض بالمتوسط فلا تضيف تبايناً، لكنها تدخل في عدد الصفوف
+    variance = np.maximum(total_sq - count * mean ** 2, 0) / max(n_rows, 1)
+    scale = np.sqrt(variance)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def _scale_chunk(chunk, features, mean, scale):
+    """تعويض القيم المفقودة وتطبيع جزء بمعاملات ثابتة"""
+    X = chunk[features].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(X)
+    if missing.any():
+        X[missing] = np.take(mean, np.nonzero(missing)[1])
+    return (X - mean) / scale
+
+
+def can_warm_start(model, features, n_clusters):
+    """هل يصلح النموذج المحفوظ كنقطة بداية لنفس الخصائص وعدد العناقيد؟"""
+    return model is not None and model.features == list(features) and model.n_clusters == n_clusters
+
+
+def fit_minibatch_cluster_model(chunk_source, features, n_clusters, warm_start=None,
+                                random_state=42, batch_size=4096):
+    """تجميع Mini-Batch K-Means على أجزاء متتالية عبر partial_fit
+
+    chunk_source دالة تُرجع مولّداً جديداً للأجزاء في كل استدعاء. عند البدء
+    من نموذج محفوظ تُستخدم معاملات تطبيعه ومراكزه فلا حاجة لمرور حساب الإحصاءات.
+    بعد التدريب يُعاد المرور على الأجزاء لتحديد عنقود كل منتج بالمراكز النهائية.
+    """
+    features = list(features)
+
+    if can_warm_start(warm_start, features, n_clusters):
+        mean, scale = warm_start.mean, warm_start.scale
+        init, n_init = warm_start.centroids, 1
+    else:
+        mean, scale = streaming_feature_stats(chunk_source(), features)
+        init, n_init = 'k-means++', 3
+
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, init=init, n_init=n_init,
+        random_state=random_state, batch_size=batch_size
+    )
+
+    # أول partial_fit يحتاج n_clusters صفاً على الأقل فتُجمع الأجزاء الصغيرة حتى يكتمل العدد
+    pending, n_pending = [], 0
+    fitted = False
+    for chunk in chunk_source():
+        X = _scale_chunk(chunk, features, mean, scale)
+        if len(X) == 0:
+            continue
+        if not fitted:
+            pending.append(X)
+            n_pending += len(X)
+            if n_pending < n_clusters:
+                continue
+            X = np.concatenate(pending)
+            pending = []
+            fitted = True
+        kmeans.partial_fit(X)
+
+    if not fitted:
+        raise ValueError(f"عدد المنتجات ({n_pending}) أقل من عدد العناقيد ({n_clusters})")
+
+    # المرور الثاني: العناقيد والأعضاء المحفوظة تطابق ما تعطيه assign() بالمراكز النهائية
+    labels, product_ids = [], []
+    offset = 0
+    for chunk in chunk_source():
+        X = _scale_chunk(chunk, features, mean, scale)
+        if len(X) == 0:
+            continue
+        labels.append(kmeans.predict(X))
+        if 'ProductID' in chunk.columns:
+            product_ids.append(chunk['ProductID'].to_numpy())
+        else:
+            product_ids.append(np.arange(offset, offset + len(X)))
+        offset += len(X)
+
+    return ClusterModel(
+        features, mean, scale, kmeans.cluster_centers_,
+        np.concatenate(labels), np.concatenate(product_ids)
+    )
+
+
+@traced("perform_clustering")
+def perform_clustering(df, features, n_clusters, backend="kmeans", warm_start=None, chunk_rows=100_000):
+    """تنفيذ التجميع باستخدام K-Means أو Mini-Batch K-Means على دفعات"""
+    if backend == "minibatch":
+        model = fit_minibatch_cluster_model(
+            lambda: iter_frame_chunks(df, chunk_rows), features, n_clusters, warm_start
+        )
+
+        # إعادة المراكز إلى فضاء تطبيع الجدول الحالي (قد يختلف عن تطبيع النموذج المحفوظ)
+        _, mean, scale = prepare_features(df, features)
+        centers = (model.centroids * model.scale + model.mean - mean) / scale
+        return model.labels, centers
+
+    X_scaled, _, _ = prepare_features(df, features)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    clusters = kmeans.fit_predict(X_scaled)
+
+    return clusters, kmeans.cluster_centers_
+
+
+def main():
+    import argparse
+
+    from src.data_preprocessing import PRODUCTS_FILE, PRODUCTS_PARQUET, has_parquet, load_products
+
+    parser = argparse.ArgumentParser(description="تجميع المنتجات بـ Mini-Batch K-Means على دفعات")
+    parser.add_argument('--features', nargs='+', default=['Price', 'Rating'])
+    parser.add_argument('--clusters', type=int, default=3)
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--warm-start', action='store_true', help="البدء من النموذج المحفوظ")
+    parser.add_argument('--output', default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    if has_parquet(PRODUCTS_PARQUET, PRODUCTS_FILE):
+        chunk_source = lambda: iter_file_chunks(PRODUCTS_PARQUET, args.features, args.chunk_rows)
+    elif os.path.exists(PRODUCTS_FILE):
+        chunk_source = lambda: iter_file_chunks(PRODUCTS_FILE, args.features, args.chunk_rows)
+    else:
+        # البيانات التجريبية عند غياب ملف المنتجات
+        products_df = load_products()
+        chunk_source = lambda: iter_frame_chunks(products_df, args.chunk_rows)
+
+    warm_start = load_cluster_model(args.output) if args.warm_start else None
+    model = fit_minibatch_cluster_model(chunk_source, args.features, args.clusters, warm_start)
+    model.save(args.output)
+    sizes = np.diff(model.member_offsets).tolist()
+    print(f"{len(model.labels)} منتج في {model.n_clusters} عناقيد: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from src.tracing import traced
+
+PRODUCTS_FILE = "data/Extended_Products_Dataset__25_Products.csv"
+INVOICES_FILE = "data/Invoices_Dataset_for_Association_Rules.csv"
+
+# نسخ Parquet الناتجة عن `python -m src.ingest`
+PARQUET_DIR = "data/processed/parquet"
+PRODUCTS_PARQUET = os.path.join(PARQUET_DIR, "products.parquet")
+INVOICES_PARQUET = os.path.join(PARQUET_DIR, "invoices")
+INGEST_MARKER = "_ingest.json"
+
+# أنواع صريحة لتقليل الذاكرة: فئات نصية مكررة، أرقام صحيحة 32 بت، وأعداد عشرية 32 بت
+PRODUCTS_DTYPES = {
+    'ProductID': 'int32',
+    'Category': 'category',
+    'Brand': 'category',
+    'Price': 'float32',
+    'Rating': 'float32',
+    'Stock': 'float32',
+    'PowerWatt': 'float32',
+    'WeightKg': 'float32'
+}
+
+INVOICES_DTYPES = {
+    'InvoiceID': 'int32',
+    'ProductID': 'int32',
+    'Quantity': 'int32'
+}
+
+# نسخة واحدة من كل ملف (ومن كل مجموعة أعمدة) لكل عملية، مشتركة بين كل الجلسات
+# (المسار، الأعمدة) ← (وقت التعديل، الحجم، الجدول)
+_cache = {}
+_lock = threading.Lock()
+
+
+def _memoized(key, version_path, read):
+    """تنفيذ القراءة مرة واحدة وإعادتها فقط عند تغير وقت تعديل الملف"""
+    stat = os.stat(version_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        # ربما حمّلته جلسة أخرى أثناء الانتظار
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        df = read()
+        _cache[key] = (version, df)
+        return df
+
+
+def load_csv(path, dtypes=None, columns=None):
+    """تحميل ملف CSV مرة واحدة وإعادة تحميله فقط عند تغير وقت تعديله"""
+    key = (path, tuple(columns) if columns else None)
+    return _memoized(key, path, lambda: pd.read_csv(path, dtype=dtypes, usecols=columns))
+
+
+def load_parquet(path, columns=None, filters=None):
+    """تحميل ملف أو مجموعة Parquet مع قراءة الأعمدة المطلوبة فقط وتصفية الأقسام على القرص"""
+    marker = os.path.join(path, INGEST_MARKER) if os.path.isdir(path) else None
+
+    if columns is None and marker is not None:
+        # استبعاد عمود التقسيم المضاف أثناء التحويل
+        with open(marker, encoding='utf-8') as f:
+            columns = json.load(f)['columns']
+
+    def read():
+        return pd.read_parquet(path, columns=columns, filters=filters)
+
+    # نتائج التصفية تتغير مع كل استعلام فلا تُخزن
+    if filters:
+        return read()
+
+    key = (path, tuple(columns) if columns else None)
+    return _memoized(key, marker or path, read)
+
+
+def apply_filters(df, filters):
+    """تطبيق شروط بصيغة pyarrow [(عمود، عملية، قيمة)] على جدول محمّل"""
+    if not filters:
+        return df
+
+    operations = {
+        '==': lambda col, value: col == value,
+        '=': lambda col, value: col == value,
+        '!=': lambda col, value: col != value,
+        '<': lambda col, value: col < value,
+        '<=': lambda col, value: col <= value,
+        '>': lambda col, value: col > value,
+        '>=': lambda col, value: col >= value,
+        'in': lambda col, value: col.isin(value),
+        'not in': lambda col, value: ~col.isin(value)
+    }
+
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= operations[op](df[column], value)
+    return df[mask]
+
+
+def has_parquet(path, source_path=None):
+    """هل توجد نسخة Parquet مكتملة وأحدث من ملف CSV الأصلي؟"""
+    version_path = path if path.endswith('.parquet') else os.path.join(path, INGEST_MARKER)
+    if not os.path.exists(version_path):
+        return False
+    if source_path is None or not os.path.exists(source_path):
+        return True
+    return os.path.getmtime(version_path) >= os.path.getmtime(source_path)
+
+
+@traced("load_products")
+def load_products(fallback=True, columns=None):
+    """تحميل بيانات المنتجات (أو البيانات التجريبية إذا لم يوجد الملف)"""
+    if has_parquet(PRODUCTS_PARQUET, PRODUCTS_FILE):
+        return load_parquet(PRODUCTS_PARQUET, columns)
+
+    try:
+        return load_csv(PRODUCTS_FILE, PRODUCTS_DTYPES, columns)
+    except FileNotFoundError:
+        if not fallback:
+            raise
+        return _demo_frame('products', _demo_products, columns)
+
+
+@traced("load_invoices")
+def load_invoices(fallback=True, columns=None, filters=None):
+    """تحميل بيانات الفواتير مع اختيار الأعمدة والشروط (أو البيانات التجريبية إذا لم يوجد الملف)"""
+    if has_parquet(INVOICES_PARQUET, INVOICES_FILE):
+        return load_parquet(INVOICES_PARQUET, columns, filters)
+
+    try:
+        df = load_csv(INVOICES_FILE, INVOICES_DTYPES, columns)
+    except FileNotFoundError:
+        if not fallback:
+            raise
+        df = _demo_frame('invoices', _demo_invoices, columns)
+
+    return apply_filters(df, filters)
+
+
+def invoice_columns():
+    """أسماء أعمدة الفواتير دون تحميل البيانات"""
+    if has_parquet(INVOICES_PARQUET, INVOICES_FILE):
+        with open(os.path.join(INVOICES_PARQUET, INGEST_MARKER), encoding='utf-8') as f:
+            return json.load(f)['columns']
+
+    if os.path.exists(INVOICES_FILE):
+        return list(pd.read_csv(INVOICES_FILE, nrows=0).columns)
+
+    return list(_demo_frame('invoices', _demo_invoices).columns)
+
+
+def clear_cache():
+    """مسح الجداول المحملة"""
+    with _lock:
+        _cache.clear()
+
+
+def _demo_frame(name, build, columns=None):
+    """إنشاء البيانات التجريبية (وكل مجموعة أعمدة منها) مرة واحدة"""
+    key = (f"demo:{name}", tuple(columns) if columns else None)
+    if key not in _cache:
+        df = _demo_frame(name, build)[list(columns)] if columns else build()
+        _cache[key] = (None, df)
+    return _cache[key][1]
+
+
+def _demo_products():
+    """بيانات منتجات تجريبية"""
+    data = {
+        'ProductID': list(range(1, 13)),
+        'ProductName': ['Bluetooth Headset', 'Portable SSD', 'Surge Protector', 'Wireless Mouse', '4K Monitor', 'External HDD', 'Flash Drive', 'Gaming Mouse', 'Conference Webcam', 'Ergonomic Chair', 'Desk Lamp', 'USB Cable'],
+        'Brand': ['Sony', 'Samsung', 'Belkin', 'Logitech', 'LG', 'WD', 'SanDisk', 'Razer', 'Logitech', 'IKEA', 'Philips', 'Anker'],
+        'Category': ['Accessories', 'Storage', 'Accessories', 'Accessories', 'Electronics', 'Storage', 'Storage', 'Accessories', 'Electronics', 'Furniture', 'Accessories', 'Accessories'],
+        'Price': [55, 80, 30, 15.99, 300, 60, 12, 35, 90, 180, 18, 8],
+        'Rating': [4.2, 4.6, 4.5, 4.4, 5.0, 4.7, 4.3, 4.9, 4.6, 4.9, 4.2, 4.1],
+        'Stock': [190, 168, 216, 158, 38, 114, 76, 156, 66, 163, 156, 200],
+        'PowerWatt': [5, 2, 5, 2, 0, 5, 5, 0, 20, 30, 5, 0],
+        'WeightKg': [3.56, 1.13, 2.0, 5.26, 0.13, 0.96, 1.3, 2.86, 5.68, 4.14, 5.71, 0.05]
+    }
+    return pd.DataFrame(data).astype(PRODUCTS_DTYPES)
+
+
+def _demo_invoices():
+    """بيانات فواتير تجريبية"""
+    data = {
+        'InvoiceID': [2001, 2001, 2001, 2001, 2002, 2002, 2002, 2002, 2002, 2003, 2003, 2004],
+        'ProductID': [17, 9, 25, 1, 13, 8, 19, 11, 25, 16, 22, 23],
+        'Quantity': [1, 1, 2, 1, 1, 1, 3, 1, 1, 1, 1, 2]
+    }
+    return pd.DataFrame(data).astype(INVOICES_DTYPES)
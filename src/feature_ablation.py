@@ -0,0 +1,213 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+from src.clustering import prepare_features
+from src.parallel_mining import default_workers
+from src.price_impact import SIMILARITY_COLUMNS, sampled_similarity_scores
+
+CATEGORICAL_FEATURES = ['Category', 'Brand']
+SEARCH_MODES = ('forward', 'backward', 'exhaustive')
+
+# المرحلة الأولى (السباق) على عينة صغيرة من المنتجات لاستبعاد التوليفات الضعيفة مبكراً
+RACE_SAMPLE_ROWS = 2_000
+RACE_SAMPLES_PER_CLUSTER = 10
+FULL_SAMPLES_PER_CLUSTER = 20
+
+# عرض فترة الثقة: التوليفة تُستبعد إذا كان حدها الأعلى أقل من الحد الأدنى للأفضل
+BOUND_Z = 3.0
+
+# البحث الشامل ينمو أُسياً فيُقيد بعدد الخصائص
+MAX_EXHAUSTIVE_FEATURES = 12
+
+
+def candidate_features(df):
+    """الخصائص الرقمية والفئوية المتاحة للبحث"""
+    numeric = [
+        col for col in df.select_dtypes(include='number').columns
+        if col != 'ProductID' and df[col].notna().any()
+    ]
+    categorical = [col for col in CATEGORICAL_FEATURES if col in df.columns]
+    return numeric + categorical
+
+
+def feature_matrix(df, features):
+    """مصفوفة العنقدة: الخصائص الرقمية مطبعة والفئوية بترميز one-hot"""
+    numeric = [f for f in features if f not in CATEGORICAL_FEATURES]
+    categorical = [f for f in features if f in CATEGORICAL_FEATURES]
+
+    blocks = []
+    if numeric:
+        blocks.append(prepare_features(df, numeric)[0])
+    for col in categorical:
+        blocks.append(pd.get_dummies(df[col], dtype=np.float64).to_numpy())
+    return np.hstack(blocks)
+
+
+def _evaluate(df, features, n_clusters, samples_per_cluster, n_init):
+    """جودة توليفة واحدة: متوسط التشابه داخل العناقيد وخطؤه المعياري"""
+    X = feature_matrix(df, features)
+    labels = KMeans(n_clusters=n_clusters, random_state=42, n_init=n_init).fit_predict(X)
+    scores, _ = sampled_similarity_scores(df, labels, samples_per_cluster)
+
+    if len(scores) == 0:
+        return 0.0, 0.0
+    stderr = scores.std(ddof=1) / np.sqrt(len(scores)) if len(scores) > 1 else 0.0
+    return float(scores.mean()), float(stderr)
+
+
+def _evaluate_many(df, subsets, n_clusters, samples_per_cluster, n_init, n_workers):
+    """تقييم مجموعة توليفات بالتوازي"""
+    n_workers = min(n_workers, len(subsets))
+    if n_workers <= 1:
+        return [_evaluate(df, s, n_clusters, samples_per_cluster, n_init) for s in subsets]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(
+            _evaluate,
+            [df] * len(subsets),
+            subsets,
+            [n_clusters] * len(subsets),
+            [samples_per_cluster] * len(subsets),
+            [n_init] * len(subsets),
+            chunksize=max(1, len(subsets) // (4 * n_workers))
+        ))
+
+
+class AblationSearch:
+    """البحث عن أفضل خصائص العنقدة مع استبعاد التوليفات التي لا يمكنها تجاوز الأفضل"""
+
+    def __init__(self, df, features=None, n_clusters=3, n_workers=None, race_rows=RACE_SAMPLE_ROWS):
+        self.features = list(features or candidate_features(df))
+        columns = list(dict.fromkeys(SIMILARITY_COLUMNS + self.features))
+        self.df = df[columns].reset_index(drop=True)
+        self.n_clusters = n_clusters
+        self.n_workers = n_workers or default_workers()
+
+        # السباق يستحق فقط إذا كانت العينة أصغر من الجدول
+        self.race_df = None
+        if len(self.df) > race_rows:
+            self.race_df = self.df.sample(n=race_rows, random_state=42).reset_index(drop=True)
+
+        # التوليفة ← (المتوسط، الخطأ المعياري) في كل مرحلة
+        self.race = {}
+        self.full = {}
+        self.pruned = set()
+
+    def _race_lower_bound(self):
+        """أعلى حد أدنى في السباق بين كل التوليفات المقيمة"""
+        return max((mean - BOUND_Z * stderr for mean, stderr in self.race.values()), default=-np.inf)
+
+    def evaluate(self, subsets):
+        """تقييم التوليفات: سباق سريع على العينة ثم تقييم كامل للمتبقية فقط"""
+        subsets = [tuple(s) for s in subsets]
+        new = [s for s in dict.fromkeys(subsets)
+               if frozenset(s) not in self.full and frozenset(s) not in self.pruned]
+
+        if new and self.race_df is not None:
+            race = _evaluate_many(
+                self.race_df, new, self.n_clusters, RACE_SAMPLES_PER_CLUSTER, 1, self.n_workers
+            )
+            for subset, result in zip(new, race):
+                self.race[frozenset(subset)] = result
+
+            floor = self._race_lower_bound()
+            survivors = []
+            for subset in new:
+                mean, stderr = self.race[frozenset(subset)]
+                if mean + BOUND_Z * stderr < floor:
+                    self.pruned.add(frozenset(subset))
+                else:
+                    survivors.append(subset)
+            new = survivors
+
+        if new:
+            full = _evaluate_many(
+                self.df, new, self.n_clusters, FULL_SAMPLES_PER_CLUSTER, 10, self.n_workers
+            )
+            for subset, result in zip(new, full):
+                self.full[frozenset(subset)] = result
+
+        return {s: self.full.get(frozenset(s), (None, None))[0] for s in subsets}
+
+    def best(self):
+        """أفضل توليفة مقيمة بالكامل ونتيجتها"""
+        if not self.full:
+            return None, None
+        subset = max(self.full, key=lambda s: (self.full[s][0], -len(s)))
+        return [f for f in self.features if f in subset], self.full[subset][0]
+
+    def forward(self, max_features=None):
+        """الاختيار الأمامي: إضافة الخاصية الأفضل في كل خطوة حتى يتوقف التحسن"""
+        max_features = max_features or len(self.features)
+        current, current_score = (), -np.inf
+
+        while len(current) < max_features:
+            candidates = [current + (f,) for f in self.features if f not in current]
+            if not candidates:
+                break
+            scores = {s: score for s, score in self.evaluate(candidates).items() if score is not None}
+            if not scores:
+                break
+            subset = max(scores, key=scores.get)
+            if scores[subset] <= current_score:
+                break
+            current, current_score = subset, scores[subset]
+
+        return self.best()
+
+    def backward(self, min_features=1):
+        """الحذف الخلفي: البدء بكل الخصائص وحذف الأقل فائدة حتى يتوقف التحسن"""
+        current = tuple(self.features)
+        current_score = self.evaluate([current])[current]
+
+        while len(current) > min_features:
+            candidates = [tuple(f for f in current if f != removed) for removed in current]
+            scores = {s: score for s, score in self.evaluate(candidates).items() if score is not None}
+            if not scores:
+                break
+            subset = max(scores, key=scores.get)
+            if current_score is not None and scores[subset] <= current_score:
+                break
+            current, current_score = subset, scores[subset]
+
+        return self.best()
+
+    def exhaustive(self):
+        """كل التوليفات الممكنة (للكتالوجات ذات الخصائص القليلة)"""
+        if len(self.features) > MAX_EXHAUSTIVE_FEATURES:
+            raise ValueError(
+                f"البحث الشامل يدعم حتى {MAX_EXHAUSTIVE_FEATURES} خاصية، استخدم البحث الأمامي أو الخلفي"
+            )
+        self.evaluate([
+            subset for size in range(1, len(self.features) + 1)
+            for subset in combinations(self.features, size)
+        ])
+        return self.best()
+
+    def results(self):
+        """جدول كل التوليفات المقيمة مرتبة حسب الجودة"""
+        rows = []
+        for subset in set(self.full) | self.pruned:
+            mean = self.full[subset][0] if subset in self.full else self.race[subset][0]
+            rows.append({
+                'Features': ' + '.join(f for f in self.features if f in subset),
+                'N': len(subset),
+                'Score': mean,
+                'Stage': 'full' if subset in self.full else 'pruned'
+            })
+        results = pd.DataFrame(rows, columns=['Features', 'N', 'Score', 'Stage'])
+        return results.sort_values(['Stage', 'Score'], ascending=[True, False], ignore_index=True)
+
+
+def run_ablation(df, mode='forward', features=None, n_clusters=3, n_workers=None):
+    """تشغيل البحث بالطريقة المطلوبة وإرجاع كائن البحث بكل نتائجه"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"طريقة بحث غير مدعومة: {mode}")
+
+    search = AblationSearch(df, features, n_clusters, n_workers)
+    getattr(search, mode)()
+    return search
@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.association_rules import find_frequent_itemsets, generate_rules, sort_rules
+from src.baskets import BasketCSR
+from src.rule_store import (
+    DEFAULT_STORE_DIR, RULE_STORE_VERSION, file_fingerprint, load_or_build_baskets, load_rules,
+    rule_store_key, save_rules
+)
+
+# المستويات من الأدق إلى الأعم
+ITEM_LEVELS = ('product', 'brand', 'category')
+LEVEL_LABELS = {'product': "منتج", 'brand': "العلامة", 'category': "الفئة"}
+
+
+class ItemHierarchy:
+    """ترقيم موحد لعناصر كل المستويات: المنتجات ثم العلامات ثم الفئات، مع أب كل عنصر"""
+
+    def __init__(self, product_ids, products_df):
+        product_ids = np.asarray(product_ids)
+        # صف كل منتج في جدول المنتجات (-1 للمنتج غير الموجود فيه)
+        rows = pd.Index(products_df['ProductID']).get_indexer(product_ids)
+
+        brand_codes, brands = pd.factorize(products_df['Brand'].astype(str), sort=True)
+        category_codes, categories = pd.factorize(products_df['Category'].astype(str), sort=True)
+        n_products, n_brands = len(product_ids), len(brands)
+
+        self.product_ids = product_ids
+        self.offsets = {
+            'product': 0,
+            'brand': n_products,
+            'category': n_products + n_brands,
+            None: n_products + n_brands + len(categories)
+        }
+        self.names = [f"{LEVEL_LABELS['product']} {p}" for p in product_ids.tolist()]
+        self.names += [f"{LEVEL_LABELS['brand']} {b}" for b in brands]
+        self.names += [f"{LEVEL_LABELS['category']} {c}" for c in categories]
+
+        # مصفوفة البحث: العنصر ← أبوه في المستوى التالي (-1 = لا أب)
+        self.parent = np.full(len(self), -1, dtype=np.int64)
+        known = rows >= 0
+        self.parent[:n_products][known] = n_products + brand_codes[rows[known]]
+
+        # العلامة تُنسب إلى فئة فقط إذا كانت كل منتجاتها فيها، وإلا فلا أب لها
+        pairs = pd.DataFrame({'brand': brand_codes, 'category': category_codes}).drop_duplicates()
+        single = pairs[~pairs['brand'].duplicated(keep=False)]
+        self.parent[n_products + single['brand'].to_numpy()] = self.offsets['category'] + single['category'].to_numpy()
+
+        # الفئة المباشرة للمنتج تُستخدم بدلاً من فئة علامته
+        self.product_category = np.full(n_products, -1, dtype=np.int64)
+        self.product_category[known] = self.offsets['category'] + category_codes[rows[known]]
+
+    def __len__(self):
+        return self.offsets[None]
+
+    def level_of(self, item):
+        if item < self.offsets['brand']:
+            return 'product'
+        return 'brand' if item < self.offsets['category'] else 'category'
+
+    def ancestors(self, item):
+        """كل أسلاف العنصر في المستويات الأعلى"""
+        if item < self.offsets['brand']:
+            return {a for a in (self.parent[item], self.product_category[item]) if a >= 0}
+        parent = self.parent[item]
+        return {parent} if parent >= 0 else set()
+
+
+def extend_baskets(baskets, hierarchy, levels=ITEM_LEVELS):
+    """إضافة علامة وفئة كل منتج إلى سلته بمصفوفات البحث في تمريرة واحدة"""
+    lengths = np.diff(baskets.indptr)
+    rows = np.repeat(np.arange(len(baskets), dtype=np.int64), lengths)
+    codes = baskets.codes.astype(np.int64)
+
+    parts_rows, parts_items = [], []
+    if 'product' in levels:
+        parts_rows.append(rows)
+        parts_items.append(codes)
+    for level, lookup in (('brand', hierarchy.parent[:hierarchy.offsets['brand']]),
+                          ('category', hierarchy.product_category)):
+        if level in levels:
+            items = lookup[codes]
+            known = items >= 0
+            parts_rows.append(rows[known])
+            parts_items.append(items[known])
+
+    rows, items = np.concatenate(parts_rows), np.concatenate(parts_items)
+
+    # منتجان من نفس العلامة في فاتورة واحدة يعدان ظهوراً واحداً للعلامة
+    order = np.lexsort((items, rows))
+    rows, items = rows[order], items[order]
+    keep = np.r_[True, (rows[1:] != rows[:-1]) | (items[1:] != items[:-1])] if len(rows) else np.empty(0, bool)
+    rows, items = rows[keep], items[keep]
+
+    indptr = np.zeros(len(baskets) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=len(baskets)), out=indptr[1:])
+    return BasketCSR(indptr, items.astype(np.int32), baskets.invoice_ids, np.arange(len(hierarchy)))
+
+
+def exclusive_items(hierarchy):
+    """كل عنصر ← أسلافه وأحفاده: مجموعة تجمع عنصراً وأحد أسلافه (مثل المنتج وعلامته) لا تضيف معلومة"""
+    exclusive = {}
+    for item in range(len(hierarchy)):
+        for ancestor in hierarchy.ancestors(item):
+            ancestor = int(ancestor)
+            exclusive.setdefault(item, set()).add(ancestor)
+            exclusive.setdefault(ancestor, set()).add(item)
+    return exclusive
+
+
+def find_hierarchical_rules(baskets, products_df, min_support=0.05, min_confidence=0.5, max_len=3,
+                            levels=ITEM_LEVELS):
+    """قواعد بين عناصر كل المستويات، مع عد دعم كل المستويات في تنقيب واحد"""
+    hierarchy = ItemHierarchy(baskets.product_ids, products_df)
+    extended = extend_baskets(baskets, hierarchy, levels)
+
+    # العنصر وأسلافه يُحذفون من قواعد بعضهم الشرطية فلا تُولد المجموعات المكررة أصلاً
+    itemsets = find_frequent_itemsets(extended, min_support, max_len, exclusive_items(hierarchy))
+
+    # الترتيب قبل إعادة التسمية لأن المفاتيح تصبح خليطاً من أرقام ونصوص
+    rules = sort_rules(generate_rules(itemsets, len(baskets), min_confidence))
+    for rule in rules:
+        antecedent, consequent = rule['antecedent_ids'], rule['consequent_ids']
+        rule['antecedent'] = ' + '.join(hierarchy.names[item] for item in antecedent)
+        rule['consequent'] = ' + '.join(hierarchy.names[item] for item in consequent)
+        rule['antecedent_level'] = '+'.join(sorted({hierarchy.level_of(item) for item in antecedent}))
+        rule['consequent_level'] = '+'.join(sorted({hierarchy.level_of(item) for item in consequent}))
+        # أرقام المنتجات الأصلية بدلاً من الترقيم الموحد (اسم العلامة أو الفئة لغيرها)
+        rule['antecedent_ids'] = tuple(_item_key(item, hierarchy) for item in antecedent)
+        rule['consequent_ids'] = tuple(_item_key(item, hierarchy) for item in consequent)
+
+    return rules
+
+
+def _item_key(item, hierarchy):
+    if hierarchy.level_of(item) == 'product':
+        return hierarchy.product_ids[item].item()
+    return hierarchy.names[item]
+
+
+def load_or_mine_hierarchical_rules(invoices_path, products_path, products_df, min_support=0.05,
+                                    min_confidence=0.5, max_len=3, levels=ITEM_LEVELS,
+                                    store_dir=DEFAULT_STORE_DIR):
+    """قراءة القواعد متعددة المستويات من المخزن، أو تنقيبها عند تغير الفواتير أو المنتجات أو المعاملات"""
+    key = rule_store_key(
+        file_fingerprint(invoices_path),
+        kind='hierarchy',
+        products=file_fingerprint(products_path),
+        min_support=min_support,
+        min_confidence=min_confidence,
+        max_len=max_len,
+        levels=list(levels)
+    )
+    rules_path = os.path.join(store_dir, f"hierarchy_{key}.json")
+    if os.path.exists(rules_path):
+        rules, _ = load_rules(rules_path)
+        return rules
+
+    baskets = load_or_build_baskets(invoices_path, store_dir)
+    rules = find_hierarchical_rules(baskets, products_df, min_support, min_confidence, max_len, levels)
+    save_rules(rules_path, rules, {
+        'version': RULE_STORE_VERSION,
+        'source_file': os.path.basename(invoices_path),
+        'products_file': os.path.basename(products_path),
+        'min_support': min_support,
+        'min_confidence': min_confidence,
+        'max_len': max_len,
+        'levels': list(levels),
+        'transactions': len(baskets)
+    })
+    return rules
@@ -0,0 +1,253 @@
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.association_rules import min_support_count, rules_from_cooccurrence
+
+# حجم الكتلة من بداية ونهاية الجزء المقروء المستخدمة لاكتشاف إعادة كتابة الملف
+SIGNATURE_BLOCK = 4096
+
+
+class IncrementalRuleMiner:
+    """عدادات دعم المنتجات والأزواج مع تحديثها بالفواتير المضافة أو المحذوفة فقط"""
+
+    def __init__(self, date_column='InvoiceDate'):
+        self.date_column = date_column
+        # قابل لإعادة الدخول: sync_csv تستدعي add_invoices وهي تحمل القفل
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        """مسح كل العدادات"""
+        self._codes = {}
+        self._product_ids = []
+        # فاتورة ← (الدلو الزمني، أكواد المنتجات)
+        self._baskets = {}
+        # دلو زمني (يوم) ← [مصفوفة التكرار المشترك، عدد الفواتير]
+        self._buckets = {}
+        self._csv_path = None
+        self._csv_offset = 0
+        self._csv_columns = None
+        # هوية الملف وبصمة الجزء المقروء منه ووقت تعديله عند آخر مزامنة
+        self._csv_identity = None
+        self._csv_signature = None
+        self._csv_mtime = None
+
+    @property
+    def total_transactions(self):
+        return len(self._baskets)
+
+    def _encode(self, product_ids):
+        """ترميز أرقام المنتجات مع إضافة المنتجات الجديدة إلى نهاية القاموس"""
+        codes = np.empty(len(product_ids), dtype=np.int32)
+        for i, product_id in enumerate(product_ids):
+            code = self._codes.get(product_id)
+            if code is None:
+                code = len(self._product_ids)
+                self._codes[product_id] = code
+                self._product_ids.append(product_id)
+            codes[i] = code
+        return codes
+
+    def _pair_counts(self, code_lists):
+        """مصفوفة التكرار المشترك لمجموعة فواتير (القطر = دعم كل منتج)"""
+        n_items = len(self._product_ids)
+        lengths = np.fromiter((len(codes) for codes in code_lists), dtype=np.int64, count=len(code_lists))
+        if lengths.sum() == 0:
+            return sparse.csr_matrix((n_items, n_items), dtype=np.int64)
+
+        rows = np.repeat(np.arange(len(code_lists)), lengths)
+        cols = np.concatenate(code_lists)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(cols), dtype=np.int64), (rows, cols)),
+            shape=(len(code_lists), n_items)
+        )
+        return (incidence.T @ incidence).tocsr()
+
+    def _apply(self, baskets_by_bucket, sign):
+        """إضافة أو طرح عدادات الفواتير من الدلاء الزمنية الخاصة بها"""
+        n_items = len(self._product_ids)
+        for bucket, code_lists in baskets_by_bucket.items():
+            counts = self._pair_counts(code_lists)
+            entry = self._buckets.setdefault(
+                bucket, [sparse.csr_matrix((n_items, n_items), dtype=np.int64), 0]
+            )
+            entry[0].resize((n_items, n_items))
+            entry[0] = entry[0] + sign * counts
+            entry[0].eliminate_zeros()
+            entry[1] += sign * len(code_lists)
+
+            if entry[1] == 0:
+                del self._buckets[bucket]
+
+    def add_invoices(self, invoices_df):
+        """تطبيق الفواتير الجديدة فقط على العدادات"""
+        if len(invoices_df) == 0:
+            return
+
+        with self._lock:
+            if self.date_column in invoices_df.columns:
+                dates = pd.to_datetime(invoices_df[self.date_column]).dt.normalize()
+                buckets = dates.groupby(invoices_df['InvoiceID']).first().to_dict()
+            else:
+                buckets = {}
+
+            grouped = invoices_df.groupby('InvoiceID')['ProductID'].apply(list).to_dict()
+
+            # أسطر جديدة لفاتورة موجودة: تُطرح الفاتورة القديمة ثم تُضاف بعد الدمج
+            existing = [invoice_id for invoice_id in grouped if invoice_id in self._baskets]
+            if existing:
+                for invoice_id, (_, codes) in zip(existing, self._pop_baskets(existing)):
+                    grouped[invoice_id] = [self._product_ids[code] for code in codes] + grouped[invoice_id]
+
+            added = {}
+            for invoice_id, products in grouped.items():
+                bucket = buckets.get(invoice_id)
+                codes = np.unique(self._encode(products))
+                self._baskets[invoice_id] = (bucket, codes)
+                added.setdefault(bucket, []).append(codes)
+
+            self._apply(added, 1)
+
+    def _pop_baskets(self, invoice_ids):
+        """حذف فواتير من السجل وطرح عداداتها"""
+        removed = {}
+        popped = []
+        for invoice_id in invoice_ids:
+            basket = self._baskets.pop(invoice_id, None)
+            if basket is None:
+                continue
+            popped.append(basket)
+            removed.setdefault(basket[0], []).append(basket[1])
+
+        self._apply(removed, -1)
+        return popped
+
+    def remove_invoices(self, invoice_ids):
+        """حذف فواتير (مثلاً عند انزلاق النافذة الزمنية) دون إعادة حساب البقية"""
+        with self._lock:
+            self._pop_baskets(invoice_ids)
+
+    def expire_before(self, cutoff):
+        """حذف كل الفواتير الأقدم من تاريخ معين"""
+        cutoff = pd.Timestamp(cutoff).normalize()
+        with self._lock:
+            expired = [
+                invoice_id for invoice_id, (bucket, _) in self._baskets.items()
+                if bucket is not None and bucket < cutoff
+            ]
+            self._pop_baskets(expired)
+
+    def _signature(self, f):
+        """بصمة أول وآخر كتلة من الجزء المقروء سابقاً: الإضافة إلى نهاية الملف لا تغيرها"""
+        f.seek(0)
+        head = f.read(min(SIGNATURE_BLOCK, self._csv_offset))
+        start = max(0, self._csv_offset - SIGNATURE_BLOCK)
+        f.seek(start)
+        tail = f.read(self._csv_offset - start)
+        return hashlib.sha1(head + tail).hexdigest()
+
+    def _replaced(self, path, stat, f):
+        """هل كُتب الملف من جديد منذ آخر مزامنة (وليس مجرد أسطر مضافة إلى نهايته)"""
+        if path != self._csv_path or (stat.st_dev, stat.st_ino) != self._csv_identity:
+            return True
+        if stat.st_size < self._csv_offset:
+            return True
+        # الإضافة تزيد الحجم دائماً: تغير وقت التعديل بنفس الحجم يعني إعادة كتابة
+        if stat.st_size == self._csv_offset and stat.st_mtime_ns != self._csv_mtime:
+            return True
+        return self._csv_offset > 0 and self._signature(f) != self._csv_signature
+
+    def sync_csv(self, path):
+        """قراءة الأسطر المضافة إلى نهاية ملف الفواتير منذ آخر مزامنة فقط"""
+        with self._lock, open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+
+            # الملف استُبدل أو قُصّ أو أُعيدت كتابته: إعادة البناء من البداية
+            if self._replaced(path, stat, f):
+                self._reset()
+                self._csv_path = path
+                self._csv_identity = (stat.st_dev, stat.st_ino)
+            self._csv_mtime = stat.st_mtime_ns
+
+            if stat.st_size == self._csv_offset:
+                return 0
+
+            if self._csv_columns is None:
+                f.seek(0)
+                header = f.readline()
+                self._csv_columns = header.decode('utf-8').strip().split(',')
+                self._csv_offset = len(header)
+            f.seek(self._csv_offset)
+            data = f.read(stat.st_size - self._csv_offset)
+
+            # تجاهل السطر الأخير إذا لم تكتمل كتابته بعد
+            complete = data.rfind(b'\n') + 1
+            if complete == 0:
+                self._csv_signature = self._signature(f)
+                return 0
+
+            new_rows = pd.read_csv(io.BytesIO(data[:complete]), header=None, names=self._csv_columns)
+            self.add_invoices(new_rows)
+            self._csv_offset += complete
+            self._csv_signature = self._signature(f)
+            return len(new_rows)
+
+    def window_counts(self, last_days=None):
+        """جمع عدادات الدلاء الزمنية ضمن آخر N يوم (أو كل البيانات)"""
+        n_items = len(self._product_ids)
+        buckets = list(self._buckets)
+
+        if last_days is not None:
+            dated = [bucket for bucket in buckets if bucket is not None]
+            if dated:
+                cutoff = max(dated) - pd.Timedelta(days=last_days - 1)
+                buckets = [bucket for bucket in dated if bucket >= cutoff]
+
+        pairs = sparse.csr_matrix((n_items, n_items), dtype=np.int64)
+        total_transactions = 0
+        for bucket in buckets:
+            matrix, count = self._buckets[bucket]
+            matrix.resize((n_items, n_items))
+            pairs = pairs + matrix
+            total_transactions += count
+
+        return pairs, total_transactions
+
+    def rules(self, min_support=0.1, min_confidence=0.5, last_days=None):
+        """قواعد (منتج ← منتج) من العدادات الحالية دون إعادة قراءة السجل"""
+        with self._lock:
+            pairs, total_transactions = self.window_counts(last_days)
+            known_products = self._product_ids
+
+        if total_transactions == 0:
+            return []
+
+        item_counts = pairs.diagonal()
+        frequent = np.flatnonzero(item_counts >= min_support_count(min_support, total_transactions))
+        if len(frequent) < 2:
+            return []
+
+        product_ids = [known_products[code] for code in frequent]
+        return rules_from_cooccurrence(
+            pairs[frequent][:, frequent], item_counts[frequent], product_ids,
+            total_transactions, min_confidence
+        )
+
+
+# عداد واحد لكل ملف مشترك بين كل الجلسات
+_miners = {}
+
+
+def get_incremental_miner(path, date_column='InvoiceDate'):
+    """إرجاع العداد المشترك للملف بعد تطبيق الأسطر المضافة إليه"""
+    miner = _miners.get(path)
+    if miner is None:
+        miner = _miners.setdefault(path, IncrementalRuleMiner(date_column))
+    miner.sync_csv(path)
+    return miner
@@ -0,0 +1,106 @@
+"""تحويل ملفات CSV إلى Parquet مقسّم بأنواع صريحة
+
+الاستخدام:
+    python -m src.ingest
+    python -m src.ingest --chunk-rows 2000000 --invoice-range 500000
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data_preprocessing import (
+    INGEST_MARKER, INVOICES_DTYPES, INVOICES_FILE, INVOICES_PARQUET,
+    PRODUCTS_DTYPES, PRODUCTS_FILE, PRODUCTS_PARQUET
+)
+
+DATE_COLUMN = 'InvoiceDate'
+
+
+def ingest_products(csv_path=PRODUCTS_FILE, out_path=PRODUCTS_PARQUET):
+    """تحويل ملف المنتجات إلى ملف Parquet واحد"""
+    df = pd.read_csv(csv_path, dtype=PRODUCTS_DTYPES)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    tmp_path = f"{out_path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+    return len(df)
+
+
+def _partition_column(chunk, invoice_range):
+    """إضافة عمود التقسيم: الشهر إذا وُجد تاريخ، وإلا نطاق أرقام الفواتير"""
+    if DATE_COLUMN in chunk.columns:
+        dates = pd.to_datetime(chunk[DATE_COLUMN])
+        chunk[DATE_COLUMN] = dates
+        return chunk.assign(InvoiceMonth=dates.dt.strftime('%Y-%m')), 'InvoiceMonth'
+
+    start = (chunk['InvoiceID'] // invoice_range) * invoice_range
+    return chunk.assign(InvoiceRange=start.astype('int32')), 'InvoiceRange'
+
+
+def ingest_invoices(csv_path=INVOICES_FILE, out_dir=INVOICES_PARQUET,
+                    chunk_rows=1_000_000, invoice_range=100_000):
+    """تحويل ملف الفواتير إلى Parquet مقسّم على دفعات دون تحميله كاملاً"""
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    total_rows = 0
+    columns = None
+    partition_column = None
+    started = time.perf_counter()
+
+    for i, chunk in enumerate(pd.read_csv(csv_path, dtype=INVOICES_DTYPES, chunksize=chunk_rows)):
+        if columns is None:
+            columns = list(chunk.columns)
+
+        chunk, partition_column = _partition_column(chunk, invoice_range)
+        pq.write_to_dataset(
+            pa.Table.from_pandas(chunk, preserve_index=False),
+            root_path=tmp_dir,
+            partition_cols=[partition_column],
+            basename_template=f"part-{i:05d}-{{i}}.parquet"
+        )
+        total_rows += len(chunk)
+
+    metadata = {
+        'source_file': os.path.basename(csv_path),
+        'columns': columns,
+        'partition_column': partition_column,
+        'rows': total_rows,
+        'seconds': round(time.perf_counter() - started, 3),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    # ملف العلامة يُكتب أخيراً ويُستخدم كإصدار للمجموعة عند التحميل
+    with open(os.path.join(tmp_dir, INGEST_MARKER), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تحويل ملفات البيانات إلى Parquet")
+    parser.add_argument('--products', default=PRODUCTS_FILE)
+    parser.add_argument('--invoices', default=INVOICES_FILE)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--invoice-range', type=int, default=100_000,
+                        help="عدد أرقام الفواتير في كل قسم عند غياب عمود التاريخ")
+    args = parser.parse_args()
+
+    if os.path.exists(args.products):
+        print(f"المنتجات: {ingest_products(args.products)} سطر")
+    if os.path.exists(args.invoices):
+        metadata = ingest_invoices(args.invoices, chunk_rows=args.chunk_rows, invoice_range=args.invoice_range)
+        print(f"الفواتير: {metadata['rows']} سطر مقسّمة حسب {metadata['partition_column']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""فهرس مقلوب من كل منتج إلى الفواتير التي تحتويه بصيغة Roaring مضغوطة
+
+أرقام الفواتير التسلسلية تقسم إلى حاويات من 65536 فاتورة. الحاوية قليلة العناصر
+تُخزن كمصفوفة uint16 مرتبة، والكثيفة كخريطة بتات من 1024 كلمة uint64. دعم أي
+مجموعة منتجات هو عدد عناصر تقاطع حاوياتها. الفهرس يُخزن كملفات npy في مجلد
+ويُفتح بالربط مع الذاكرة فلا يُقرأ منه إلا ما يلمسه الاستعلام.
+"""
+import os
+import shutil
+
+import numpy as np
+
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+BITMAP_WORDS = CONTAINER_SIZE // 64
+
+# الحاوية تتحول إلى خريطة بتات عندما تصبح المصفوفة أكبر منها (4096 × 2 بايت = 8 كيلوبايت)
+ARRAY_MAX_CARDINALITY = 4096
+
+ARRAY, BITMAP = 0, 1
+
+_ARRAYS = (
+    'product_ids', 'invoice_ids', 'product_offsets', 'keys', 'kinds',
+    'cardinalities', 'data_offsets', 'array_data', 'bitmap_data'
+)
+
+# عدد البتات المضبوطة في كل بايت
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words):
+    return int(_POPCOUNT[np.ascontiguousarray(words).view(np.uint8)].sum())
+
+
+def _bitmap_of(values):
+    """خريطة بتات لحاوية من قيمها الصغيرة (uint16)"""
+    words = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    values = values.astype(np.int64)
+    np.bitwise_or.at(words, values >> 6, np.left_shift(np.uint64(1), (values & 63).astype(np.uint64)))
+    return words
+
+
+def _bitmap_values(words):
+    """القيم المضبوطة في خريطة بتات"""
+    bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+class InvoiceBitmapIndex:
+    """منتج ← خرائط بتات مضغوطة لأرقام الفواتير التسلسلية التي تحتويه"""
+
+    def __init__(self, product_ids, invoice_ids, product_offsets, keys, kinds,
+                 cardinalities, data_offsets, array_data, bitmap_data):
+        self.product_ids = product_ids
+        self.invoice_ids = invoice_ids
+        # حاويات المنتج رقم i هي [product_offsets[i], product_offsets[i + 1])
+        self.product_offsets = product_offsets
+        self.keys = keys
+        self.kinds = kinds
+        self.cardinalities = cardinalities
+        # بداية الحاوية في array_data (مصفوفة) أو رقم صفها في bitmap_data (خريطة بتات)
+        self.data_offsets = data_offsets
+        self.array_data = array_data
+        self.bitmap_data = bitmap_data
+        self._row = {product_id: row for row, product_id in enumerate(np.asarray(product_ids).tolist())}
+
+    def __len__(self):
+        """عدد الفواتير المفهرسة"""
+        return len(self.invoice_ids)
+
+    def __contains__(self, product_id):
+        return product_id in self._row
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def item_counts(self):
+        """عدد الفواتير لكل منتج بترتيب product_ids"""
+        counts = np.zeros(len(self.product_ids), dtype=np.int64)
+        non_empty = np.flatnonzero(np.diff(self.product_offsets) > 0)
+        counts[non_empty] = np.add.reduceat(
+            np.asarray(self.cardinalities, dtype=np.int64), self.product_offsets[non_empty]
+        )
+        return counts
+
+    def _containers(self, product_id):
+        """حاويات منتج واحد: مفتاح الحاوية ← رقمها"""
+        row = self._row.get(product_id)
+        if row is None:
+            return {}
+        start, stop = self.product_offsets[row], self.product_offsets[row + 1]
+        return dict(zip(self.keys[start:stop].tolist(), range(start, stop)))
+
+    def _values(self, container):
+        start = self.data_offsets[container]
+        if self.kinds[container] == ARRAY:
+            return self.array_data[start:start + self.cardinalities[container]]
+        return _bitmap_values(self.bitmap_data[start])
+
+    def _intersect(self, containers):
+        """تقاطع حاويات بنفس المفتاح: (القيم أو None، كلمات خريطة البتات أو None)"""
+        # البدء بالأصغر: التقاطع لا يكبر أبداً
+        containers = sorted(containers, key=lambda c: self.cardinalities[c])
+        arrays = [c for c in containers if self.kinds[c] == ARRAY]
+        bitmaps = [self.bitmap_data[self.data_offsets[c]] for c in containers if self.kinds[c] == BITMAP]
+
+        if not arrays:
+            words = bitmaps[0]
+            for other in bitmaps[1:]:
+                words = words & other
+            return None, words
+
+        values = self._values(arrays[0])
+        for container in arrays[1:]:
+            values = np.intersect1d(values, self._values(container), assume_unique=True)
+        for words in bitmaps:
+            if len(values) == 0:
+                break
+            wide = values.astype(np.int64)
+            hit = (words[wide >> 6] >> (wide & 63).astype(np.uint64)) & np.uint64(1)
+            values = values[hit.astype(bool)]
+        return values, None
+
+    def _common(self, product_ids):
+        """مفاتيح الحاويات المشتركة بين كل المنتجات مع أرقام حاوياتها"""
+        per_product = [self._containers(product_id) for product_id in dict.fromkeys(product_ids)]
+        if not per_product or any(not containers for containers in per_product):
+            return []
+        per_product.sort(key=len)
+        keys = set(per_product[0]).intersection(*per_product[1:])
+        return [(key, [containers[key] for containers in per_product]) for key in sorted(keys)]
+
+    def support_count(self, product_ids):
+        """عدد الفواتير التي تحتوي كل المنتجات معاً"""
+        total = 0
+        for _, containers in self._common(product_ids):
+            if len(containers) == 1:
+                total += int(self.cardinalities[containers[0]])
+                continue
+            values, words = self._intersect(containers)
+            total += len(values) if words is None else _popcount(words)
+        return total
+
+    def support_counts(self, itemsets):
+        """دعم عدة مجموعات دفعة واحدة: المجموعة ← عدد الفواتير"""
+        return {itemset: self.support_count(itemset) for itemset in itemsets}
+
+    def invoices_containing(self, product_ids):
+        """أرقام الفواتير الأصلية التي تحتوي كل المنتجات معاً"""
+        ordinals = []
+        for key, containers in self._common(product_ids):
+            values, words = self._intersect(containers)
+            if words is not None:
+                values = _bitmap_values(words)
+            ordinals.append((key << CONTAINER_BITS) + values.astype(np.int64))
+        if not ordinals:
+            return self.invoice_ids[:0]
+        return np.asarray(self.invoice_ids)[np.concatenate(ordinals)]
+
+    def save(self, path):
+        """حفظ الفهرس كمجلد ملفات npy (تُستبدل كاملة حتى لا يُقرأ فهرس ناقص)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """فتح فهرس محفوظ مع ربط ملفاته بالذاكرة"""
+        mode = 'r' if mmap else None
+        return cls(*(
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False) for name in _ARRAYS
+        ))
+
+
+def build_invoice_bitmaps(baskets):
+    """بناء الفهرس من سلال CSR (رقم الفاتورة التسلسلي = رقم صفها في السلال)"""
+    lengths = np.diff(baskets.indptr)
+    rows = np.repeat(np.arange(len(baskets), dtype=np.int64), lengths)
+    codes = baskets.codes.astype(np.int64)
+
+    # الترتيب حسب (المنتج، الفاتورة) يجعل كل حاوية نطاقاً متصلاً
+    order = np.lexsort((rows, codes))
+    rows, codes = rows[order], codes[order]
+
+    keys = rows >> CONTAINER_BITS
+    low = (rows & (CONTAINER_SIZE - 1)).astype(np.uint16)
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (keys[1:] != keys[:-1])])
+    cardinalities = np.diff(np.r_[starts, len(rows)]).astype(np.int32)
+    container_codes = codes[starts]
+    kinds = np.where(cardinalities > ARRAY_MAX_CARDINALITY, BITMAP, ARRAY).astype(np.uint8)
+
+    # الحاويات المصفوفة تُنسخ قيمها كما هي، والكثيفة تُحوّل إلى خرائط بتات
+    is_array = np.repeat(kinds == ARRAY, cardinalities)
+    array_data = low[is_array]
+    data_offsets = np.zeros(len(starts), dtype=np.int64)
+    array_sizes = np.where(kinds == ARRAY, cardinalities, 0)
+    data_offsets[kinds == ARRAY] = (np.cumsum(array_sizes) - array_sizes)[kinds == ARRAY]
+
+    bitmap_containers = np.flatnonzero(kinds == BITMAP)
+    bitmap_data = np.zeros((len(bitmap_containers), BITMAP_WORDS), dtype=np.uint64)
+    for row, container in enumerate(bitmap_containers.tolist()):
+        start = starts[container]
+        bitmap_data[row] = _bitmap_of(low[start:start + cardinalities[container]])
+    data_offsets[bitmap_containers] = np.arange(len(bitmap_containers))
+
+    product_offsets = np.zeros(baskets.n_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(container_codes, minlength=baskets.n_items), out=product_offsets[1:])
+
+    return InvoiceBitmapIndex(
+        np.asarray(baskets.product_ids), np.asarray(baskets.invoice_ids), product_offsets,
+        keys[starts].astype(np.uint16), kinds, cardinalities, data_offsets, array_data, bitmap_data
+    )
@@ -0,0 +1,159 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+from src.clustering import prepare_features
+from src.parallel_mining import default_workers
+from src.rule_store import rule_store_key
+
+DEFAULT_SWEEP_DIR = "data/processed/clusters"
+DEFAULT_K_RANGE = range(2, 11)
+
+# حساب السيلويت يتطلب مسافات كل الأزواج فيُحسب على عينة للجداول الكبيرة
+SILHOUETTE_SAMPLE = 10_000
+
+# أقل عدد منتجات يستحق معه توزيع الحسابات على عمليات
+MIN_PARALLEL_ROWS = 5_000
+
+# نتائج المسح المحملة في هذه العملية حسب المفتاح
+_loaded = {}
+
+
+def data_hash(df, features):
+    """بصمة قيم الخصائص المستخدمة في التجميع"""
+    hashed = pd.util.hash_pandas_object(df[list(features)], index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def _evaluate_k(X, k, sample_size=SILHOUETTE_SAMPLE, random_state=42):
+    """تجميع K-Means لقيمة K واحدة مع مقاييس الجودة"""
+    # نفس إعدادات صفحة التجميع حتى تُستخدم النتيجة مباشرة بدون إعادة تدريب
+    kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=10)
+    labels = kmeans.fit_predict(X)
+
+    sample = sample_size if len(X) > sample_size else None
+    return {
+        'k': k,
+        'inertia': float(kmeans.inertia_),
+        'silhouette': float(silhouette_score(X, labels, sample_size=sample, random_state=random_state)),
+        'davies_bouldin': float(davies_bouldin_score(X, labels)),
+        'labels': labels.astype(np.int32),
+        'centers': kmeans.cluster_centers_
+    }
+
+
+class KSweep:
+    """نتائج تجميع مجموعة من قيم K: المقاييس وعنقود كل منتج والمراكز"""
+
+    def __init__(self, ks, inertia, silhouette, davies_bouldin, labels, centers):
+        self.ks = np.asarray(ks, dtype=np.int32)
+        self.inertia = np.asarray(inertia, dtype=np.float64)
+        self.silhouette = np.asarray(silhouette, dtype=np.float64)
+        self.davies_bouldin = np.asarray(davies_bouldin, dtype=np.float64)
+        # صف لكل K
+        self.labels = np.asarray(labels, dtype=np.int32)
+        # مراكز كل K متتالية: المراكز من offsets[i] إلى offsets[i + 1]
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.offsets = np.zeros(len(self.ks) + 1, dtype=np.int64)
+        np.cumsum(self.ks, out=self.offsets[1:])
+
+    def __contains__(self, k):
+        return k in self.ks.tolist()
+
+    def metrics(self):
+        """جدول المقاييس لكل K"""
+        return pd.DataFrame({
+            'K': self.ks,
+            'Inertia': self.inertia,
+            'Silhouette': self.silhouette,
+            'DaviesBouldin': self.davies_bouldin
+        })
+
+    def best_k(self):
+        """قيمة K ذات أعلى سيلويت (وعند التساوي أقل Davies-Bouldin)"""
+        best = np.lexsort((self.davies_bouldin, -self.silhouette))[0]
+        return int(self.ks[best])
+
+    def result(self, k):
+        """عنقود كل منتج والمراكز لقيمة K محسوبة مسبقاً"""
+        i = self.ks.tolist().index(k)
+        return self.labels[i], self.centers[self.offsets[i]:self.offsets[i + 1]]
+
+    def save(self, path):
+        """حفظ النتائج كملف npz"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ks=self.ks,
+                inertia=self.inertia,
+                silhouette=self.silhouette,
+                davies_bouldin=self.davies_bouldin,
+                labels=self.labels,
+                centers=self.centers
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """تحميل نتائج محفوظة"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['ks'], data['inertia'], data['silhouette'], data['davies_bouldin'],
+                data['labels'], data['centers']
+            )
+
+
+def run_k_sweep(X, ks=DEFAULT_K_RANGE, n_workers=None, sample_size=SILHOUETTE_SAMPLE):
+    """تجميع كل قيم K بالتوازي على عمليات منفصلة"""
+    # السيلويت معرف فقط لـ 2 <= K < عدد المنتجات
+    ks = [k for k in ks if 2 <= k < len(X)]
+    if not ks:
+        raise ValueError("لا توجد قيم K صالحة لهذا العدد من المنتجات")
+
+    n_workers = min(n_workers or default_workers(), len(ks))
+    if n_workers <= 1 or len(X) < MIN_PARALLEL_ROWS:
+        results = [_evaluate_k(X, k, sample_size) for k in ks]
+    else:
+        # الأكبر أولاً لأنها الأبطأ فتتوزع الأحمال بشكل أفضل
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(
+                _evaluate_k, [X] * len(ks), sorted(ks, reverse=True), [sample_size] * len(ks)
+            ))
+        results.sort(key=lambda r: r['k'])
+
+    return KSweep(
+        [r['k'] for r in results],
+        [r['inertia'] for r in results],
+        [r['silhouette'] for r in results],
+        [r['davies_bouldin'] for r in results],
+        np.stack([r['labels'] for r in results]),
+        np.concatenate([r['centers'] for r in results])
+    )
+
+
+def load_or_run_k_sweep(df, features, ks=DEFAULT_K_RANGE, store_dir=DEFAULT_SWEEP_DIR, n_workers=None):
+    """تحميل نتائج المسح المحفوظة لنفس الخصائص والبيانات، وإلا حسابها وحفظها"""
+    features = list(features)
+    ks = list(ks)
+    key = rule_store_key(data_hash(df, features), kind='k_sweep', features=features, ks=ks,
+                         sample_size=SILHOUETTE_SAMPLE)
+    if key in _loaded:
+        return _loaded[key]
+
+    path = os.path.join(store_dir, f"ksweep_{key}.npz")
+    if os.path.exists(path):
+        sweep = KSweep.load(path)
+    else:
+        X, _, _ = prepare_features(df, features)
+        sweep = run_k_sweep(X, ks, n_workers)
+        sweep.save(path)
+
+    _loaded[key] = sweep
+    return sweep
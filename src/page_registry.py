@@ -0,0 +1,80 @@
+"""سجل صفحات التطبيق: كل صفحة (ومكتباتها الثقيلة) تُستورد عند أول فتح لها فقط
+
+الاستخدام:
+    python -m src.page_registry
+"""
+import importlib
+import subprocess
+import sys
+import time
+
+# معرف الصفحة ← (الوحدة، دالة العرض)
+PAGES = {
+    "data_analysis": ("pages.Data_Analysis", "show_data_analysis_page"),
+    "association_rules": ("pages.association_rules", "show_association_rules_page"),
+    "clustering": ("pages.clustering", "show_clustering_page"),
+    "price_impact": ("pages.Beast_Price", "show_price_impact_page"),
+    "recommendation": ("pages.recommendation_system", "show_recommendation_page")
+}
+
+# زمن أول استيراد لكل صفحة في هذه العملية (بالثواني)
+_import_times = {}
+
+
+def get_page(page_id):
+    """دالة عرض الصفحة مع استيراد وحدتها عند أول طلب"""
+    module_name, function_name = PAGES[page_id]
+
+    module = sys.modules.get(module_name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _import_times[page_id] = time.perf_counter() - started
+
+    return getattr(module, function_name)
+
+
+def startup_report():
+    """زمن استيراد كل صفحة في هذه العملية (None للصفحات التي لم تُفتح بعد)"""
+    return [
+        {
+            'page': page_id,
+            'module': module_name,
+            'loaded': module_name in sys.modules,
+            'import_ms': round(_import_times[page_id] * 1000, 1) if page_id in _import_times else None
+        }
+        for page_id, (module_name, _) in PAGES.items()
+    ]
+
+
+def cold_import_times():
+    """زمن استيراد كل صفحة في عملية جديدة، بعد streamlit و pandas المشتركة بين كل الصفحات"""
+    code = (
+        "import sys, time\n"
+        "import streamlit, pandas\n"
+        "started = time.perf_counter()\n"
+        "__import__(sys.argv[1])\n"
+        "print(time.perf_counter() - started)\n"
+    )
+
+    # الصفحة الرئيسية لا تحتاج غير وحدة تحميل البيانات
+    modules = {'home': 'src.data_preprocessing'}
+    modules.update({page_id: module for page_id, (module, _) in PAGES.items()})
+
+    times = {}
+    for page_id, module in modules.items():
+        result = subprocess.run(
+            [sys.executable, '-c', code, module], capture_output=True, text=True, check=True
+        )
+        times[page_id] = float(result.stdout.strip().splitlines()[-1])
+    return times
+
+
+def main():
+    print("زمن الاستيراد البارد لكل صفحة (بعد streamlit و pandas):")
+    for page_id, seconds in cold_import_times().items():
+        print(f"  {page_id:<20} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.association_rules import (
+    build_incidence_matrix, find_frequent_itemsets, generate_rules, min_support_count
+)
+from src.baskets import BasketCSR
+from src.invoice_bitmaps import _POPCOUNT
+
+# أقل عدد فواتير لكل عملية يستحق معه التوزيع
+MIN_SHARD_SIZE = 10_000
+
+
+def default_workers():
+    """عدد العمليات الافتراضي"""
+    return os.cpu_count() or 1
+
+
+def shard_baskets(baskets, n_shards):
+    """تقسيم السلال إلى أجزاء متتالية متقاربة الحجم"""
+    if not isinstance(baskets, BasketCSR):
+        incidence, product_ids = build_incidence_matrix(baskets)
+        baskets = BasketCSR(
+            incidence.indptr.astype(np.int32), incidence.indices.astype(np.int32),
+            np.asarray(list(baskets.keys())), product_ids
+        )
+
+    bounds = np.linspace(0, len(baskets), n_shards + 1).astype(np.int64)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if stop <= start:
+            continue
+        offset = baskets.indptr[start]
+        yield BasketCSR(
+            baskets.indptr[start:stop + 1] - offset,
+            baskets.codes[offset:baskets.indptr[stop]],
+            baskets.invoice_ids[start:stop],
+            baskets.product_ids
+        )
+
+
+def _local_candidates(shard, min_support, max_len):
+    """المرحلة الأولى: المجموعات المتكررة محلياً في الجزء بنفس نسبة الدعم"""
+    return list(find_frequent_itemsets(shard, min_support, max_len))
+
+
+def _packed_columns(incidence, codes):
+    """أعمدة مصفوفة الوقوع (CSC) كمصفوفات بتات مضغوطة، صف لكل عمود"""
+    n_bytes = (incidence.shape[0] + 7) // 8
+    bits = np.zeros((len(codes), n_bytes), dtype=np.uint8)
+    for i, code in enumerate(codes):
+        rows = incidence.indices[incidence.indptr[code]:incidence.indptr[code + 1]]
+        np.bitwise_or.at(bits[i], rows >> 3, (128 >> (rows & 7)).astype(np.uint8))
+    return bits
+
+
+def _count_candidates(shard, candidates):
+    """المرحلة الثانية: العد الدقيق لدعم كل مرشح في الجزء"""
+    code_of = {product_id: code for code, product_id in enumerate(np.asarray(shard.product_ids).tolist())}
+    incidence = shard.to_incidence().tocsc()
+    counts = {}
+
+    singles = [c for c in candidates if len(c) == 1]
+    pairs = [c for c in candidates if len(c) == 2]
+    larger = [c for c in candidates if len(c) > 2]
+
+    if singles:
+        item_counts = shard.item_counts()
+        for candidate in singles:
+            (product_id,) = candidate
+            counts[candidate] = int(item_counts[code_of[product_id]])
+
+    if pairs:
+        # كل الأزواج من ضرب مصفوفي واحد على الأعمدة المعنية فقط
+        involved = sorted({code_of[p] for c in pairs for p in c})
+        column = {code: i for i, code in enumerate(involved)}
+        sub = incidence[:, involved]
+        cooccurrence = (sub.T @ sub).tocsr()
+        first, second = np.array([[column[code_of[p]] for p in c] for c in pairs]).T
+        pair_counts = np.asarray(cooccurrence[first, second]).ravel()
+        for candidate, count in zip(pairs, pair_counts.tolist()):
+            counts[candidate] = int(count)
+
+    if larger:
+        # تقاطع مصفوفات البتات مع إعادة استخدام تقاطع البادئة المشتركة
+        involved = sorted({code_of[p] for c in larger for p in c})
+        column = {code: i for i, code in enumerate(involved)}
+        bits = _packed_columns(incidence, involved)
+
+        # بعد الترتيب تتجاور المرشحات ذات البادئة الواحدة فيكفي تذكر آخر بادئة
+        keyed = sorted((tuple(sorted(column[code_of[p]] for p in c)), c) for c in larger)
+        last_prefix, prefix_bits = None, None
+        for columns, candidate in keyed:
+            if columns[:-1] != last_prefix:
+                last_prefix = columns[:-1]
+                prefix_bits = np.bitwise_and.reduce(bits[list(last_prefix)], axis=0)
+            both = prefix_bits & bits[columns[-1]]
+            counts[candidate] = int(_POPCOUNT[both].sum())
+
+    return counts
+
+
+def find_frequent_itemsets_parallel(baskets, min_support=0.1, max_len=None, n_workers=None, bitmap_index=None):
+    """استخراج المجموعات المتكررة بالتوازي على أجزاء الفواتير (خوارزمية SON)"""
+    total_transactions = len(baskets)
+    if total_transactions == 0:
+        return {}
+
+    n_workers = n_workers or default_workers()
+    n_shards = min(n_workers, max(1, total_transactions // MIN_SHARD_SIZE))
+    if n_shards <= 1:
+        return find_frequent_itemsets(baskets, min_support, max_len)
+
+    shards = list(shard_baskets(baskets, n_shards))
+    min_count = min_support_count(min_support, total_transactions)
+
+    with ProcessPoolExecutor(max_workers=n_shards) as pool:
+        # المرحلة الأولى: كل مجموعة متكررة كلياً متكررة محلياً في جزء واحد على الأقل
+        local = pool.map(
+            _local_candidates, shards, [min_support] * n_shards, [max_len] * n_shards
+        )
+        candidates = set()
+        for itemsets in local:
+            candidates.update(itemsets)
+
+        # المرحلة الثانية: العد الدقيق من فهرس الفواتير إن وجد، وإلا دمج عدادات كل الأجزاء
+        candidates = list(candidates)
+        if bitmap_index is not None:
+            totals = bitmap_index.support_counts(candidates)
+        else:
+            totals = Counter()
+            for counts in pool.map(_count_candidates, shards, [candidates] * n_shards):
+                totals.update(counts)
+
+    return {itemset: count for itemset, count in totals.items() if count >= min_count}
+
+
+def mine_association_rules_parallel(baskets, min_support=0.1, min_confidence=0.5, max_len=None,
+                                    n_workers=None, bitmap_index=None):
+    """استخراج قواعد الارتباط بالتوازي (نفس نتيجة التنقيب التسلسلي)"""
+    itemsets = find_frequent_itemsets_parallel(baskets, min_support, max_len, n_workers, bitmap_index)
+    yield from generate_rules(itemsets, len(baskets), min_confidence)
@@ -0,0 +1,158 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from src.clustering import prepare_features
+from src.k_selection import data_hash
+from src.parallel_mining import default_workers
+from src.rule_store import rule_store_key
+from src.similarity import get_similarity_engine
+
+DEFAULT_STUDY_DIR = "data/processed/price_impact"
+STUDY_FEATURES = ['Price', 'Rating', 'Stock', 'PowerWatt', 'WeightKg']
+
+# عدد المنتجات المختارة كعينة من كل عنقود
+SAMPLES_PER_CLUSTER = 20
+
+# أقل عدد منتجات يستحق معه توزيع التجارب على عمليات
+MIN_PARALLEL_ROWS = 2_000
+
+# أعمدة محرك التشابه
+SIMILARITY_COLUMNS = ['Category', 'Brand', 'Price', 'Rating']
+
+# نتائج التجارب المحملة في هذه العملية حسب المفتاح
+_loaded = {}
+
+
+def study_variants(features, all_subsets=False):
+    """توليفات الخصائص المطلوب مقارنتها: مع السعر وبدونه، أو كل التوليفات"""
+    features = list(features)
+    if all_subsets:
+        return [list(subset) for size in range(1, len(features) + 1)
+                for subset in combinations(features, size)]
+
+    variants = [features]
+    if 'Price' in features and len(features) > 1:
+        variants.append([f for f in features if f != 'Price'])
+    return variants
+
+
+def sampled_similarity_scores(df, labels, samples_per_cluster=SAMPLES_PER_CLUSTER, random_state=42):
+    """نقاط تشابه عينات كل عنقود مع باقي أعضائه، مع عنقود كل عينة"""
+    engine = get_similarity_engine(df)
+    rng = np.random.default_rng(random_state)
+
+    scores, clusters = [], []
+    for cluster in range(labels.max() + 1):
+        members = np.flatnonzero(labels == cluster)
+        if len(members) < 2:
+            continue
+
+        samples = rng.choice(members, size=min(samples_per_cluster, len(members)), replace=False)
+        for position in samples:
+            others = members[members != position]
+            scores.append(engine.scores(position)[others].mean())
+            clusters.append(cluster)
+
+    return np.asarray(scores, dtype=np.float64), np.asarray(clusters, dtype=np.int64)
+
+
+def intra_cluster_similarity(df, labels, samples_per_cluster=SAMPLES_PER_CLUSTER, random_state=42):
+    """متوسط نقاط التشابه (من 100) بين عينات كل عنقود وباقي أعضائه"""
+    scores, clusters = sampled_similarity_scores(df, labels, samples_per_cluster, random_state)
+
+    per_cluster = []
+    for cluster in range(labels.max() + 1):
+        cluster_scores = scores[clusters == cluster]
+        per_cluster.append(float(cluster_scores.mean()) if len(cluster_scores) else None)
+
+    average = float(scores.mean()) if len(scores) else 0.0
+    return average, per_cluster
+
+
+def run_variant(df, features, n_clusters, samples_per_cluster=SAMPLES_PER_CLUSTER):
+    """تجربة واحدة: العنقدة على الخصائص المعطاة ثم تقييم التشابه داخل العناقيد"""
+    X_scaled, _, _ = prepare_features(df, features)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(X_scaled)
+
+    average, per_cluster = intra_cluster_similarity(df, labels, samples_per_cluster)
+    return {
+        'features': list(features),
+        'includes_price': 'Price' in features,
+        'n_clusters': n_clusters,
+        'avg_similarity': average,
+        'cluster_similarity': per_cluster,
+        'cluster_sizes': np.bincount(labels, minlength=n_clusters).tolist()
+    }
+
+
+def _variant_key(source_hash, features, n_clusters, samples_per_cluster):
+    return rule_store_key(
+        source_hash, kind='price_impact', features=list(features),
+        n_clusters=n_clusters, samples_per_cluster=samples_per_cluster
+    )
+
+
+def _load_result(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_result(path, result):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_price_study(df, variants, n_clusters=3, samples_per_cluster=SAMPLES_PER_CLUSTER,
+                    store_dir=DEFAULT_STUDY_DIR, n_workers=None):
+    """تشغيل التجارب غير المحفوظة بالتوازي وإرجاع نتائج كل التوليفات بنفس الترتيب"""
+    columns = list(dict.fromkeys(SIMILARITY_COLUMNS + [f for v in variants for f in v]))
+    study_df = df[columns].reset_index(drop=True)
+
+    # مفتاح كل تجربة من أعمدتها هي فقط، فلا يتغير بتغير باقي التوليفات المختارة
+    keys = [
+        _variant_key(
+            data_hash(study_df, list(dict.fromkeys(SIMILARITY_COLUMNS + list(features)))),
+            features, n_clusters, samples_per_cluster
+        )
+        for features in variants
+    ]
+
+    results = {}
+    missing = []
+    for key, features in zip(keys, variants):
+        path = os.path.join(store_dir, f"variant_{key}.json")
+        if key in _loaded:
+            results[key] = _loaded[key]
+        elif os.path.exists(path):
+            results[key] = _loaded[key] = _load_result(path)
+        elif key not in {k for k, _, _ in missing}:
+            missing.append((key, path, features))
+
+    if missing:
+        n_workers = min(n_workers or default_workers(), len(missing))
+        if n_workers <= 1 or len(study_df) < MIN_PARALLEL_ROWS:
+            computed = [run_variant(study_df, f, n_clusters, samples_per_cluster) for _, _, f in missing]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                computed = list(pool.map(
+                    run_variant,
+                    [study_df] * len(missing),
+                    [f for _, _, f in missing],
+                    [n_clusters] * len(missing),
+                    [samples_per_cluster] * len(missing)
+                ))
+
+        for (key, path, _), result in zip(missing, computed):
+            _save_result(path, result)
+            results[key] = _loaded[key] = result
+
+    return [results[key] for key in keys]
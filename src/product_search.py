@@ -0,0 +1,173 @@
+import re
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# عدد المرشحين المفحوصين لكل استعلام (يحد زمن البحث مهما كبر الكتالوج)
+MAX_CANDIDATES = 5_000
+DEFAULT_LIMIT = 20
+
+# أقل تشابه (Jaccard للمقاطع الثلاثية) لقبول تصحيح كلمة
+FUZZY_MIN_SIMILARITY = 0.3
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# آخر فهرس مبني مع الجدول الذي بُني منه
+_index_cache = {}
+
+
+def tokenize(text):
+    """كلمات النص بأحرف صغيرة"""
+    return _TOKEN.findall(str(text).lower())
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """فهرس بادئات مرتب لكلمات اسم المنتج والعلامة التجارية، مع بحث تقريبي بالمقاطع الثلاثية"""
+
+    def __init__(self, products_df):
+        self.names = products_df['ProductName'].astype(str).tolist()
+        self.brands = products_df['Brand'].astype(str).tolist()
+        self.prices = products_df['Price'].to_numpy(dtype=np.float64)
+
+        entries = []
+        self.tokens_of = []
+        for position, (name, brand) in enumerate(zip(self.names, self.brands)):
+            tokens = tuple(dict.fromkeys(tokenize(name) + tokenize(brand)))
+            self.tokens_of.append(tokens)
+            entries.extend((token, position) for token in tokens)
+
+        # مصفوفة مرتبة حسب (الكلمة، الموضع): كل بادئة نطاق متصل فيها
+        entries.sort()
+        self.tokens = [token for token, _ in entries]
+        self.positions = np.fromiter((position for _, position in entries), dtype=np.int64, count=len(entries))
+        self._trigram_index = None
+        self._vocabulary = None
+        self._vocabulary_grams = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def label(self, position):
+        """نص عرض المنتج في قائمة الاختيار"""
+        return f"{self.names[position]} - {self.brands[position]} (${self.prices[position]:.2f})"
+
+    def _prefix_range(self, prefix):
+        """نطاق الكلمات التي تبدأ بالبادئة، والكلمة المطابقة تماماً في أوله"""
+        start = bisect_left(self.tokens, prefix)
+        stop = bisect_left(self.tokens, prefix + '\uffff', lo=start)
+        return start, stop
+
+    def _candidates(self, start, stop):
+        """(رقم المدخل، موضع المنتج) في النطاق بالترتيب دون تكرار، على دفعات حتى لا يُحوّل النطاق كله"""
+        seen = set()
+        chunk = 64
+        stop = min(stop, start + MAX_CANDIDATES)
+        while start < stop:
+            for entry, position in enumerate(self.positions[start:min(stop, start + chunk)].tolist(), start):
+                if position not in seen:
+                    seen.add(position)
+                    yield entry, position
+            start += chunk
+            chunk *= 4
+
+    def prefix_search(self, query, limit=DEFAULT_LIMIT):
+        """المنتجات التي تبدأ كل كلمات الاستعلام كلمةً فيها، الأكثر تطابقاً أولاً"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return list(range(min(limit, len(self))))
+
+        ranges = [self._prefix_range(word) for word in words]
+        if any(start == stop for start, stop in ranges):
+            return []
+
+        # المرشحون من أضيق نطاق، ثم التحقق من باقي الكلمات في كلمات المنتج نفسه
+        rarest = min(range(len(words)), key=lambda i: ranges[i][1] - ranges[i][0])
+        start, stop = ranges[rarest]
+        rarest_exact_stop = bisect_right(self.tokens, words[rarest], start, stop)
+        rarest_has_exact = rarest_exact_stop > start
+
+        # أعلى درجة ممكنة = عدد الكلمات التي لها مطابقة تامة في المفردات، وتنقص بعد تجاوز
+        # المطابقات التامة لأضيق كلمة
+        ceiling = sum(self.tokens[first] == word for word, (first, _) in zip(words, ranges))
+        matched = []
+        by_score = [0] * (len(words) + 1)
+        for entry, position in self._candidates(start, stop):
+            if rarest_has_exact and entry >= rarest_exact_stop:
+                rarest_has_exact = False
+                ceiling -= 1
+
+            tokens = self.tokens_of[position]
+            exact = 0
+            for word in words:
+                if word in tokens:
+                    exact += 1
+                elif not any(token.startswith(word) for token in tokens):
+                    break
+            else:
+                matched.append((-exact, len(matched), position))
+                by_score[exact] += 1
+
+            # لا يمكن لمرشح لاحق أن يتفوق على منتجات بلغت أعلى درجة ممكنة
+            if sum(by_score[ceiling:]) >= limit:
+                break
+
+        matched.sort()
+        return [position for _, _, position in matched[:limit]]
+
+    def correct(self, word):
+        """أقرب كلمة في المفردات للكلمة المكتوبة بالتشابه في المقاطع الثلاثية (None إذا لا يوجد)"""
+        if self._trigram_index is None:
+            self._vocabulary = list(dict.fromkeys(self.tokens))
+            index = {}
+            for token_id, token in enumerate(self._vocabulary):
+                for gram in _trigrams(token):
+                    index.setdefault(gram, []).append(token_id)
+            self._vocabulary_grams = np.fromiter(
+                (len(_trigrams(token)) for token in self._vocabulary), dtype=np.int64, count=len(self._vocabulary)
+            )
+            self._trigram_index = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in index.items()}
+
+        grams = _trigrams(word)
+        postings = [self._trigram_index[gram] for gram in grams if gram in self._trigram_index]
+        if not postings:
+            return None
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._vocabulary))
+        jaccard = shared / (len(grams) + self._vocabulary_grams - shared)
+        best = int(np.argmax(jaccard))
+        return self._vocabulary[best] if jaccard[best] >= FUZZY_MIN_SIMILARITY else None
+
+    def fuzzy_search(self, query, limit=DEFAULT_LIMIT):
+        """تصحيح كل كلمة لا تطابق أي بادئة ثم البحث بالبادئات (يتحمل الأخطاء الإملائية)"""
+        words = []
+        for word in tokenize(query):
+            start, stop = self._prefix_range(word)
+            if start == stop:
+                word = self.correct(word)
+                if word is None:
+                    return []
+            words.append(word)
+        return self.prefix_search(' '.join(words), limit)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """بحث بالبادئات، وعند عدم وجود نتائج بحث تقريبي"""
+        matches = self.prefix_search(query, limit)
+        if not matches and tokenize(query):
+            matches = self.fuzzy_search(query, limit)
+        return matches
+
+
+def get_search_index(products_df):
+    """إرجاع فهرس البحث للجدول مع بنائه مرة واحدة فقط"""
+    cached = _index_cache.get('index')
+    if cached is not None and cached[0] is products_df:
+        return cached[1]
+
+    index = ProductSearchIndex(products_df)
+    _index_cache['index'] = (products_df, index)
+    return index
@@ -0,0 +1,349 @@
+"""تحليل ملفات البيانات على دفعات وبالتوازي دون تحميلها كاملة
+
+لكل عمود: عدد القيم المفقودة، الأصغر والأكبر والمتوسط، عدد القيم المختلفة
+التقريبي (HyperLogLog) والمئينات التقريبية (KLL). كل عملية تحلل جزءاً من
+الملف ثم تُدمج النتائج الجزئية.
+
+الاستخدام:
+    python -m src.profiling data/Invoices_Dataset_for_Association_Rules.csv
+"""
+import argparse
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.parallel_mining import default_workers
+from src.rule_store import file_fingerprint, rule_store_key
+
+DEFAULT_PROFILE_DIR = "data/processed/profiles"
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+# حجم كل دفعة مقروءة من الملف: يحدد الذاكرة المستخدمة في كل عملية
+CHUNK_BYTES = 64 << 20
+
+# أقل حجم ملف يستحق معه التوزيع على عمليات
+MIN_PARALLEL_BYTES = 32 << 20
+
+HLL_PRECISION = 14
+KLL_K = 200
+
+
+def _bit_length(values):
+    """عدد البتات اللازمة لكل قيمة uint64 (بحث ثنائي دقيق بدون تحويل عشري)"""
+    x = values.copy()
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = x >= np.uint64(1 << shift)
+        length[wide] += shift
+        x[wide] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+class HyperLogLog:
+    """عداد تقريبي للقيم المختلفة قابل للدمج (خطأ معياري ≈ 1.04 / √m)"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        """إضافة قيم (أي نوع تدعمه pandas)"""
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(np.asarray(values))
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        # تصحيح المدى الصغير بالعد الخطي
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return float(raw)
+
+
+class KLLSketch:
+    """ملخص KLL للمئينات التقريبية: طبقات مضغوطة وزن عناصر الطبقة h هو 2^h"""
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        # إضافة طبقة جديدة تصغر سعة الطبقات الأدنى فيُعاد الفحص من البداية
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) <= self._capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            # ترتيب الطبقة والاحتفاظ بنصف العناصر (بإزاحة عشوائية) في الطبقة الأعلى
+            items = np.sort(self.levels[level])
+            keep_odd = len(items) % 2
+            leftover, items = items[:keep_odd], items[keep_odd:]
+            offset = int(self._rng.integers(2))
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset::2]])
+            self.levels[level] = leftover
+            level = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return [None] * len(qs)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        ranks = np.asarray(qs) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(items) - 1)
+        return items[positions].tolist()
+
+
+class ColumnProfile:
+    """النتيجة الجزئية لعمود واحد (قابلة للدمج مع نتائج الأجزاء الأخرى)"""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numeric = True
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.distinct = HyperLogLog()
+        self.quantiles = KLLSketch()
+
+    def update(self, column):
+        self.count += len(column)
+        values = column.dropna()
+        self.nulls += len(column) - len(values)
+        self.distinct.update(values.to_numpy())
+
+        if self.numeric and pd.api.types.is_numeric_dtype(values.dtype) \
+                and not pd.api.types.is_bool_dtype(values.dtype):
+            numbers = values.to_numpy(dtype=np.float64)
+            if len(numbers):
+                self.minimum = min(self.minimum, float(numbers.min()))
+                self.maximum = max(self.maximum, float(numbers.max()))
+                self.total += float(numbers.sum())
+                self.quantiles.update(numbers)
+        elif len(values):
+            # عمود نصي في أي جزء يجعل العمود كله نصياً
+            self.numeric = False
+
+    def merge(self, other):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.numeric = self.numeric and other.numeric
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.total += other.total
+        self.distinct.merge(other.distinct)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    def summary(self):
+        non_null = self.count - self.nulls
+        numeric = self.numeric and non_null > 0
+        summary = {
+            'type': 'numeric' if numeric else 'text',
+            'count': self.count,
+            'nulls': self.nulls,
+            'distinct': int(round(self.distinct.estimate())),
+            'min': self.minimum if numeric else None,
+            'max': self.maximum if numeric else None,
+            'mean': self.total / non_null if numeric else None
+        }
+        quantiles = self.quantiles.quantiles(QUANTILES) if numeric else [None] * len(QUANTILES)
+        for q, value in zip(QUANTILES, quantiles):
+            summary[f'p{int(q * 100)}'] = value
+        return summary
+
+
+def _profile_frames(frames):
+    """تحليل سلسلة دفعات ودمجها في نتيجة جزئية واحدة"""
+    profiles = {}
+    rows = 0
+    for frame in frames:
+        rows += len(frame)
+        for name in frame.columns:
+            profiles.setdefault(name, ColumnProfile()).update(frame[name])
+    return rows, profiles
+
+
+def _byte_ranges(path, n_parts):
+    """تقسيم ملف CSV (بعد سطر العناوين) إلى أجزاء تبدأ وتنتهي عند حدود الأسطر"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+
+        bounds = [data_start]
+        for i in range(1, n_parts):
+            f.seek(max(bounds[-1], data_start + (size - data_start) * i // n_parts))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _iter_csv_range(path, start, end, names, dtypes, chunk_bytes):
+    """قراءة جزء من ملف CSV على دفعات محدودة الحجم"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            block = f.read(min(chunk_bytes, end - position))
+            # إكمال السطر الأخير من الدفعة
+            if position + len(block) < end and not block.endswith(b'\n'):
+                block += f.readline()
+            position += len(block)
+            yield pd.read_csv(io.BytesIO(block), header=None, names=names, dtype=dtypes)
+
+
+def _profile_csv_range(path, start, end, names, dtypes, chunk_bytes):
+    return _profile_frames(_iter_csv_range(path, start, end, names, dtypes, chunk_bytes))
+
+
+def _profile_parquet_files(paths, columns, chunk_rows):
+    import pyarrow.parquet as pq
+
+    def frames():
+        for path in paths:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+
+    return _profile_frames(frames())
+
+
+def _merge(partials):
+    rows, profiles = 0, {}
+    for part_rows, part_profiles in partials:
+        rows += part_rows
+        for name, profile in part_profiles.items():
+            if name in profiles:
+                profiles[name].merge(profile)
+            else:
+                profiles[name] = profile
+    return rows, profiles
+
+
+def profile_file(path, dtypes=None, n_workers=None, chunk_bytes=CHUNK_BYTES):
+    """تحليل ملف CSV أو مجلد Parquet في مرور واحد محدود الذاكرة"""
+    n_workers = n_workers or default_workers()
+
+    if path.endswith('.csv'):
+        names = pd.read_csv(path, nrows=0).columns.tolist()
+        dtypes = {name: dtype for name, dtype in (dtypes or {}).items() if name in names}
+        n_parts = n_workers if os.path.getsize(path) >= MIN_PARALLEL_BYTES else 1
+        ranges = _byte_ranges(path, n_parts)
+        tasks = [(path, start, end, names, dtypes, chunk_bytes) for start, end in ranges]
+        worker = _profile_csv_range
+    else:
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        files = dataset.files
+        # أعمدة الملفات فقط (عمود التقسيم غير مخزن داخلها)
+        names = [name for name in dataset.schema.names if name in ds.dataset(files[0]).schema.names]
+        n_parts = min(n_workers, len(files))
+        tasks = [(files[i::n_parts], names, 1_000_000) for i in range(n_parts)]
+        worker = _profile_parquet_files
+
+    if len(tasks) <= 1:
+        rows, profiles = _merge(worker(*task) for task in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            rows, profiles = _merge(pool.map(worker, *zip(*tasks)))
+
+    return {
+        'rows': rows,
+        'columns': {name: profiles[name].summary() for name in names if name in profiles}
+    }
+
+
+def profile_frame(df):
+    """تحليل جدول محمّل بنفس صيغة نتيجة الملفات"""
+    rows, profiles = _profile_frames([df])
+    return {'rows': rows, 'columns': {name: profiles[name].summary() for name in df.columns}}
+
+
+def load_or_profile(path, dtypes=None, store_dir=DEFAULT_PROFILE_DIR, n_workers=None):
+    """تحميل التحليل المحفوظ للملف إن لم يتغير، وإلا تحليله وحفظه"""
+    if path.endswith('.csv'):
+        source = file_fingerprint(path)
+    else:
+        source = ':'.join(f"{entry.name}:{entry.stat().st_size}:{entry.stat().st_mtime_ns}"
+                          for entry in sorted(os.scandir(path), key=lambda e: e.name))
+    key = rule_store_key(source, kind='profile', path=os.path.abspath(path), quantiles=list(QUANTILES))
+    profile_path = os.path.join(store_dir, f"profile_{key}.json")
+
+    if os.path.exists(profile_path):
+        with open(profile_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    profile = profile_file(path, dtypes, n_workers)
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = f"{profile_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False)
+    os.replace(tmp_path, profile_path)
+    return profile
+
+
+def profile_table(profile):
+    """جدول العرض: صف لكل عمود"""
+    return pd.DataFrame.from_dict(profile['columns'], orient='index').rename_axis('column').reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تحليل ملف بيانات على دفعات وبالتوازي")
+    parser.add_argument('path')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    profile = profile_file(args.path, n_workers=args.workers)
+    print(f"{profile['rows']:,} صف")
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(profile_table(profile).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+
+from src.rule_store import DEFAULT_STORE_DIR, file_fingerprint, load_or_mine_rules, rule_store_key
+
+# الإعدادات الافتراضية لفهرس "يُشترى معه عادةً"
+INDEX_MIN_SUPPORT = 0.01
+INDEX_MIN_CONFIDENCE = 0.1
+INDEX_TOP_K = 10
+
+RANKING_METRICS = ('confidence', 'lift')
+
+# الفهارس المحملة في هذه العملية حسب مفتاح التخزين
+_loaded = {}
+
+
+class RuleIndex:
+    """فهرس مضغوط من كل منتج إلى أفضل K منتجات تُشترى معه"""
+
+    def __init__(self, product_ids, offsets, consequent_ids, confidence, lift):
+        self.product_ids = product_ids
+        self.offsets = offsets
+        self.consequent_ids = consequent_ids
+        self.confidence = confidence
+        self.lift = lift
+        # رقم المنتج ← رقم الصف
+        self._row = {product_id: row for row, product_id in enumerate(product_ids.tolist())}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def lookup(self, product_id, k=None):
+        """أفضل المنتجات المرتبطة بمنتج واحد كشريحة من المصفوفات (بدون بحث)"""
+        row = self._row.get(product_id)
+        if row is None:
+            empty = self.consequent_ids[:0]
+            return empty, self.confidence[:0], self.lift[:0]
+
+        start, stop = self.offsets[row], self.offsets[row + 1]
+        if k is not None:
+            stop = min(stop, start + k)
+        return self.consequent_ids[start:stop], self.confidence[start:stop], self.lift[start:stop]
+
+    def save(self, path):
+        """حفظ الفهرس كملف npz"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                product_ids=self.product_ids,
+                offsets=self.offsets,
+                consequent_ids=self.consequent_ids,
+                confidence=self.confidence,
+                lift=self.lift
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """تحميل فهرس محفوظ"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['product_ids'], data['offsets'], data['consequent_ids'],
+                data['confidence'], data['lift']
+            )
+
+
+def build_rule_index(rules, top_k=INDEX_TOP_K, metric='confidence'):
+    """بناء الفهرس من القواعد ذات المقدمة المكونة من منتج واحد"""
+    if metric not in RANKING_METRICS:
+        raise ValueError(f"معيار ترتيب غير مدعوم: {metric}")
+
+    antecedents, consequents, confidence, lift = [], [], [], []
+    for rule in rules:
+        if len(rule['antecedent_ids']) != 1:
+            continue
+        # النتيجة متعددة المنتجات تُفرد لكل منتج فيها
+        for consequent in rule['consequent_ids']:
+            antecedents.append(rule['antecedent_ids'][0])
+            consequents.append(consequent)
+            confidence.append(rule['confidence'])
+            lift.append(rule['lift'])
+
+    antecedents = np.asarray(antecedents, dtype=np.int64)
+    consequents = np.asarray(consequents, dtype=np.int64)
+    confidence = np.asarray(confidence, dtype=np.float32)
+    lift = np.asarray(lift, dtype=np.float32)
+
+    primary, secondary = (confidence, lift) if metric == 'confidence' else (lift, confidence)
+    order = np.lexsort((consequents, -secondary, -primary, antecedents))
+    antecedents, consequents = antecedents[order], consequents[order]
+    confidence, lift = confidence[order], lift[order]
+
+    if len(order) == 0:
+        return RuleIndex(antecedents, np.zeros(1, dtype=np.int32), consequents, confidence, lift)
+
+    # إبقاء أفضل ظهور لكل زوج (منتج، منتج مرتبط)
+    pair_keys = np.stack([antecedents, consequents], axis=1)
+    _, first = np.unique(pair_keys, axis=0, return_index=True)
+    keep = np.zeros(len(order), dtype=bool)
+    keep[first] = True
+    antecedents, consequents = antecedents[keep], consequents[keep]
+    confidence, lift = confidence[keep], lift[keep]
+
+    # ترتيب كل منتج داخل مجموعته ثم قص أول K
+    product_ids, starts, counts = np.unique(antecedents, return_index=True, return_counts=True)
+    rank = np.arange(len(antecedents)) - np.repeat(starts, counts)
+    keep = rank < top_k
+    antecedents, consequents = antecedents[keep], consequents[keep]
+    confidence, lift = confidence[keep], lift[keep]
+
+    offsets = np.zeros(len(product_ids) + 1, dtype=np.int32)
+    np.cumsum(np.minimum(counts, top_k), out=offsets[1:])
+
+    return RuleIndex(product_ids, offsets, consequents, confidence, lift)
+
+
+def load_or_build_rule_index(csv_path, min_support=INDEX_MIN_SUPPORT, min_confidence=INDEX_MIN_CONFIDENCE,
+                             top_k=INDEX_TOP_K, metric='confidence', store_dir=DEFAULT_STORE_DIR):
+    """تحميل الفهرس من الذاكرة أو القرص، أو بناؤه من القواعد المخزنة"""
+    key = rule_store_key(
+        file_fingerprint(csv_path),
+        kind='index',
+        min_support=min_support,
+        min_confidence=min_confidence,
+        top_k=top_k,
+        metric=metric
+    )
+    if key in _loaded:
+        return _loaded[key]
+
+    index_path = os.path.join(store_dir, f"index_{key}.npz")
+    if os.path.exists(index_path):
+        index = RuleIndex.load(index_path)
+    else:
+        # قواعد الأزواج تكفي لأن المقدمة منتج واحد
+        rules, _ = load_or_mine_rules(csv_path, min_support, min_confidence, max_len=2, store_dir=store_dir)
+        index = build_rule_index(rules, top_k, metric)
+        index.save(index_path)
+
+    _loaded[key] = index
+    return index
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from src.association_rules import TOP_K_MIN_SUPPORT, find_top_k_rules, mine_association_rules, sort_rules
+from src.baskets import BasketCSR, stream_baskets
+from src.invoice_bitmaps import InvoiceBitmapIndex, build_invoice_bitmaps
+from src.parallel_mining import mine_association_rules_parallel
+
+# يُرفع هذا الرقم عند تغيير صيغة الملفات المخزنة أو طريقة التنقيب
+RULE_STORE_VERSION = 2
+DEFAULT_STORE_DIR = "data/processed/rules"
+
+# بصمات الملفات المحسوبة مسبقاً حسب (المسار، الحجم، وقت التعديل)
+_fingerprint_cache = {}
+
+# فهارس السلال والفواتير المفتوحة في هذه العملية حسب بصمة الملف
+_baskets = {}
+_bitmap_indexes = {}
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """حساب بصمة SHA-256 لملف مع تخزينها حتى يتغير الملف"""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    if cache_key not in _fingerprint_cache:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        _fingerprint_cache[cache_key] = digest.hexdigest()
+
+    return _fingerprint_cache[cache_key]
+
+
+def rule_store_key(source_hash, **params):
+    """مفتاح الملف المخزن من بصمة البيانات ومعاملات التنقيب"""
+    payload = json.dumps(
+        {'version': RULE_STORE_VERSION, 'source': source_hash, 'params': params},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def _atomic_write(path, write):
+    """الكتابة في ملف مؤقت ثم استبداله حتى لا يقرأ مستخدم آخر ملفاً ناقصاً"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_basket_index(path, baskets):
+    """حفظ سلال التسوق بصيغة CSR مضغوطة"""
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                indptr=baskets.indptr,
+                codes=baskets.codes,
+                invoice_ids=baskets.invoice_ids,
+                product_ids=baskets.product_ids
+            )
+
+    _atomic_write(path, write)
+
+
+def load_basket_index(path):
+    """تحميل فهرس السلال المخزن بصيغة CSR"""
+    with np.load(path, allow_pickle=False) as data:
+        return BasketCSR(data['indptr'], data['codes'], data['invoice_ids'], data['product_ids'])
+
+
+def save_rules(path, rules, metadata):
+    """حفظ القواعد والبيانات الوصفية في ملف JSON"""
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'metadata': metadata, 'rules': rules}, f, ensure_ascii=False, default=_to_builtin)
+
+    _atomic_write(path, write)
+
+
+def load_rules(path):
+    """تحميل القواعد المخزنة"""
+    with open(path, encoding='utf-8') as f:
+        payload = json.load(f)
+
+    for rule in payload['rules']:
+        rule['antecedent_ids'] = tuple(rule['antecedent_ids'])
+        rule['consequent_ids'] = tuple(rule['consequent_ids'])
+
+    return payload['rules'], payload['metadata']
+
+
+def _to_builtin(value):
+    """تحويل أنواع numpy إلى أنواع JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"نوع غير مدعوم: {type(value).__name__}")
+
+
+def load_or_build_baskets(csv_path, store_dir=DEFAULT_STORE_DIR):
+    """فهرس السلال لا يعتمد على المعاملات فيُبنى ويُخزن مرة واحدة لكل نسخة من البيانات"""
+    source_hash = file_fingerprint(csv_path)
+    if source_hash in _baskets:
+        return _baskets[source_hash]
+
+    basket_path = os.path.join(store_dir, f"baskets_{source_hash[:20]}.npz")
+    if os.path.exists(basket_path):
+        basket_data = load_basket_index(basket_path)
+    else:
+        os.makedirs(store_dir, exist_ok=True)
+        basket_data = stream_baskets(csv_path)
+        save_basket_index(basket_path, basket_data)
+
+    _baskets[source_hash] = basket_data
+    return basket_data
+
+
+def load_or_build_bitmap_index(csv_path, store_dir=DEFAULT_STORE_DIR):
+    """فتح فهرس (منتج ← فواتير) المخزن بالربط مع الذاكرة، أو بناؤه من فهرس السلال"""
+    source_hash = file_fingerprint(csv_path)
+    if source_hash in _bitmap_indexes:
+        return _bitmap_indexes[source_hash]
+
+    index_path = os.path.join(store_dir, f"bitmaps_{source_hash[:20]}")
+    if not os.path.isdir(index_path):
+        build_invoice_bitmaps(load_or_build_baskets(csv_path, store_dir)).save(index_path)
+
+    index = InvoiceBitmapIndex.load(index_path)
+    _bitmap_indexes[source_hash] = index
+    return index
+
+
+def load_or_mine_rules(csv_path, min_support=0.1, min_confidence=0.5, max_len=None,
+                       store_dir=DEFAULT_STORE_DIR, n_workers=1):
+    """قراءة القواعد من الملف المخزن، أو تنقيبها وتخزينها إذا تغيرت البيانات أو المعاملات"""
+    source_hash = file_fingerprint(csv_path)
+    key = rule_store_key(
+        source_hash,
+        min_support=min_support,
+        min_confidence=min_confidence,
+        max_len=max_len
+    )
+    rules_path = os.path.join(store_dir, f"rules_{key}.json")
+
+    if os.path.exists(rules_path):
+        return load_rules(rules_path)
+
+    os.makedirs(store_dir, exist_ok=True)
+    basket_path = os.path.join(store_dir, f"baskets_{source_hash[:20]}.npz")
+    basket_data = load_or_build_baskets(csv_path, store_dir)
+
+    started = time.perf_counter()
+    if n_workers > 1:
+        # النتيجة مطابقة للتنقيب التسلسلي فلا يدخل عدد العمليات في مفتاح التخزين
+        rules = mine_association_rules_parallel(
+            basket_data, min_support, min_confidence, max_len, n_workers,
+            bitmap_index=load_or_build_bitmap_index(csv_path, store_dir)
+        )
+    else:
+        rules = mine_association_rules(basket_data, min_support, min_confidence, max_len)
+    rules = sort_rules(rules)
+
+    metadata = {
+        'version': RULE_STORE_VERSION,
+        'source_file': os.path.basename(csv_path),
+        'source_hash': source_hash,
+        'basket_index': os.path.basename(basket_path),
+        'min_support': min_support,
+        'min_confidence': min_confidence,
+        'max_len': max_len,
+        'transactions': len(basket_data),
+        'mining_seconds': round(time.perf_counter() - started, 4),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    save_rules(rules_path, rules, metadata)
+
+    return rules, metadata
+
+
+def load_or_mine_top_k_rules(csv_path, k=50, metric='confidence', max_len=3, min_support=TOP_K_MIN_SUPPORT,
+                             store_dir=DEFAULT_STORE_DIR):
+    """أفضل K قواعد من الملف المخزن، أو تنقيبها بفهرس الفواتير وتخزينها"""
+    source_hash = file_fingerprint(csv_path)
+    key = rule_store_key(
+        source_hash,
+        kind='top_k',
+        k=k,
+        metric=metric,
+        max_len=max_len,
+        min_support=min_support
+    )
+    rules_path = os.path.join(store_dir, f"top_k_{key}.json")
+
+    if os.path.exists(rules_path):
+        return load_rules(rules_path)
+
+    os.makedirs(store_dir, exist_ok=True)
+    basket_data = load_or_build_baskets(csv_path, store_dir)
+
+    started = time.perf_counter()
+    rules = find_top_k_rules(
+        basket_data, k, metric, max_len, min_support,
+        bitmap_index=load_or_build_bitmap_index(csv_path, store_dir)
+    )
+
+    metadata = {
+        'version': RULE_STORE_VERSION,
+        'source_file': os.path.basename(csv_path),
+        'source_hash': source_hash,
+        'k': k,
+        'metric': metric,
+        'max_len': max_len,
+        'min_support': min_support,
+        'transactions': len(basket_data),
+        'mining_seconds': round(time.perf_counter() - started, 4),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    save_rules(rules_path, rules, metadata)
+
+    return rules, metadata
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# أوزان التشابه: الفئة، السعر، التقييم، العلامة التجارية (المجموع 100)
+CATEGORY_WEIGHT = 30
+PRICE_WEIGHT = 25
+RATING_WEIGHT = 25
+BRAND_WEIGHT = 20
+
+MAX_RATING = 5
+
+# آخر محرك مبني مع الجدول الذي بُني منه
+_engine_cache = {}
+
+
+def _codes(column):
+    """ترميز عمود نصي أو فئوي إلى أرقام صحيحة (القيم المفقودة = -1)"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(dtype=np.int32)
+    codes, _ = pd.factorize(column)
+    return codes.astype(np.int32)
+
+
+class SimilarityEngine:
+    """حساب نقاط التشابه بين منتج وكل الكتالوج دفعة واحدة"""
+
+    def __init__(self, products_df):
+        self.category = _codes(products_df['Category'])
+        self.brand = _codes(products_df['Brand'])
+        self.price = products_df['Price'].to_numpy(dtype=np.float32)
+        self.rating = products_df['Rating'].to_numpy(dtype=np.float32)
+        self.product_ids = products_df['ProductID'].to_numpy() if 'ProductID' in products_df.columns else None
+        self._id_index = None
+        self._rating_order = None
+
+    def __len__(self):
+        return len(self.price)
+
+    def scores(self, position):
+        """نقاط التشابه (0-100) بين المنتج في الموضع المعطى وكل المنتجات"""
+        price = self.price[position]
+        rating = self.rating[position]
+
+        # التشابه في السعر: 1 - الفرق / الأكبر (fmax تحول 0/0 إلى صفر)
+        score = np.abs(self.price - price)
+        max_price = np.maximum(self.price, price)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(score, max_price, out=score)
+        np.subtract(1, score, out=score)
+        np.fmax(score, 0, out=score)
+        score *= PRICE_WEIGHT
+
+        # التشابه في التقييم
+        rating_similarity = np.abs(self.rating - rating)
+        rating_similarity *= -RATING_WEIGHT / MAX_RATING
+        rating_similarity += RATING_WEIGHT
+        np.fmax(rating_similarity, 0, out=rating_similarity)
+        score += rating_similarity
+
+        # التطابق في الفئة والعلامة التجارية (القيم المفقودة لا تتطابق)
+        category = self.category[position]
+        if category >= 0:
+            score += (self.category == category) * np.float32(CATEGORY_WEIGHT)
+        brand = self.brand[position]
+        if brand >= 0:
+            score += (self.brand == brand) * np.float32(BRAND_WEIGHT)
+
+        # مجموع الأوزان 100 فالنقاط نسبة مئوية مباشرة
+        return score
+
+    def top_k(self, position, k, mask=None):
+        """أفضل K منتجات تشابهاً (مع استبعاد المنتج نفسه) مرتبة تنازلياً"""
+        scores = self.scores(position)
+        candidates = scores.copy()
+        candidates[position] = -np.inf
+        if mask is not None:
+            candidates[~mask] = -np.inf
+            available = int(mask.sum()) - int(mask[position])
+        else:
+            available = len(candidates) - 1
+
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        top = np.argpartition(candidates, len(candidates) - k)[-k:]
+        # ترتيب تنازلي، وعند التساوي حسب الموضع في الجدول
+        top = top[np.lexsort((top, -candidates[top]))]
+        return top, scores[top]
+
+    def positions_of(self, product_ids):
+        """مواضع المنتجات حسب أرقامها (-1 للأرقام غير الموجودة)"""
+        if self._id_index is None:
+            self._id_index = pd.Index(self.product_ids)
+        return self._id_index.get_indexer(product_ids)
+
+    def top_rated(self, k, exclude=None):
+        """أعلى K منتجات تقييماً (وعند التساوي حسب الموضع في الجدول)"""
+        if self._rating_order is None:
+            self._rating_order = np.argsort(-self.rating, kind='stable')
+        top = self._rating_order[:k + 1]
+        if exclude is not None:
+            top = top[top != exclude]
+        return top[:k]
+
+
+def get_similarity_engine(products_df):
+    """إرجاع محرك التشابه للجدول مع بنائه مرة واحدة فقط"""
+    cached = _engine_cache.get('engine')
+    if cached is not None and cached[0] is products_df:
+        return cached[1]
+
+    engine = SimilarityEngine(products_df)
+    _engine_cache['engine'] = (products_df, engine)
+    return engine
@@ -0,0 +1,173 @@
+"""تتبع زمن المراحل: الزمن الفعلي وزمن المعالج وتغير الذاكرة لكل مرحلة
+
+يُفعّل لكل العملية بالمتغير STORE_TRACING=1 (مع STORE_TRACE_FILE لحفظ المراحل
+كأسطر JSON)، أو لجلسة واحدة من لوحة التتبع في الشريط الجانبي. عند التعطيل لا
+تكلف المراحل أكثر من فحص متغير واحد.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+MAX_RECENT_SPANS = 10_000
+
+_enabled = os.environ.get('STORE_TRACING') == '1'
+_trace_file = os.environ.get('STORE_TRACE_FILE')
+
+# حالة كل خيط: التفعيل للجلسة الحالية ومراحل التشغيل الحالي ومكدس المراحل المفتوحة
+_local = threading.local()
+
+# آخر المراحل من كل الخيوط للتصدير
+_recent = deque(maxlen=MAX_RECENT_SPANS)
+_lock = threading.Lock()
+
+_NOOP = nullcontext()
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss_bytes():
+    """الذاكرة المقيمة الحالية للعملية (None إذا لم تكن متاحة)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def enable(on=True):
+    """تفعيل التتبع لكل العملية"""
+    global _enabled
+    _enabled = on
+
+
+def enable_for_thread(on=True):
+    """تفعيل التتبع للخيط الحالي فقط (جلسة Streamlit واحدة)"""
+    _local.enabled = on
+
+
+def is_enabled():
+    return _enabled or getattr(_local, 'enabled', False)
+
+
+class _Span:
+    """مرحلة مفتوحة تُسجل عند الخروج منها"""
+
+    __slots__ = ('name', 'attrs', 'start', 'wall', 'cpu', 'rss')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+
+        self.start = time.time()
+        self.rss = _rss_bytes()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        rss = _rss_bytes()
+
+        stack = _local.stack
+        stack.pop()
+        record = {
+            'name': self.name,
+            'start': self.start,
+            'wall_ms': wall * 1000,
+            'cpu_ms': cpu * 1000,
+            'mem_delta_mb': (rss - self.rss) / 2 ** 20 if rss is not None and self.rss is not None else None,
+            'depth': len(stack),
+            'parent': stack[-1] if stack else None,
+            'error': exc_type.__name__ if exc_type else None
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append(record)
+        with _lock:
+            _recent.append(record)
+            if _trace_file:
+                with open(_trace_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return False
+
+
+def span(name, **attrs):
+    """مرحلة مقاسة: `with span('mining'):` (لا شيء عند التعطيل)"""
+    if not (_enabled or getattr(_local, 'enabled', False)):
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def traced(name=None):
+    """مزخرف لقياس دالة كاملة كمرحلة واحدة"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (_enabled or getattr(_local, 'enabled', False)):
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def start_run():
+    """بداية تشغيل جديد للصفحة: تفريغ مراحل التشغيل السابق لهذا الخيط"""
+    _local.spans = []
+
+
+def current_spans():
+    """مراحل التشغيل الحالي بترتيب انتهائها"""
+    return list(getattr(_local, 'spans', []))
+
+
+def recent_spans():
+    """آخر المراحل المسجلة من كل الجلسات"""
+    with _lock:
+        return list(_recent)
+
+
+def to_jsonl(spans):
+    """تصدير المراحل كأسطر JSON"""
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in spans)
+
+
+def prometheus_text(spans):
+    """تجميع المراحل حسب الاسم بصيغة Prometheus النصية"""
+    totals = {}
+    for record in spans:
+        calls, wall, cpu = totals.get(record['name'], (0, 0.0, 0.0))
+        totals[record['name']] = (calls + 1, wall + record['wall_ms'] / 1000, cpu + record['cpu_ms'] / 1000)
+
+    lines = [
+        '# HELP store_span_calls_total Number of completed spans.',
+        '# TYPE store_span_calls_total counter'
+    ]
+    lines += [f'store_span_calls_total{{span="{name}"}} {calls}' for name, (calls, _, _) in sorted(totals.items())]
+    lines += [
+        '# HELP store_span_wall_seconds_total Wall-clock time spent in spans.',
+        '# TYPE store_span_wall_seconds_total counter'
+    ]
+    lines += [f'store_span_wall_seconds_total{{span="{name}"}} {wall:.6f}' for name, (_, wall, _) in sorted(totals.items())]
+    lines += [
+        '# HELP store_span_cpu_seconds_total CPU time spent in spans.',
+        '# TYPE store_span_cpu_seconds_total counter'
+    ]
+    lines += [f'store_span_cpu_seconds_total{{span="{name}"}} {cpu:.6f}' for name, (_, _, cpu) in sorted(totals.items())]
+    return '\n'.join(lines) + '\n'
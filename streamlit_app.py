@@ -1,13 +1,10 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from PIL import Image
 import os
-from pages.Data_Analysis import show_data_analysis_page
-from pages.association_rules import show_association_rules_page
-from pages.clustering import show_clustering_page
-from pages.Beast_Price import show_price_impact_page
-from pages.recommendation_system import show_recommendation_page
+from src.data_preprocessing import PRODUCTS_FILE, INVOICES_FILE, load_products, load_invoices
+# الصفحات تُستورد عند أول فتح لها فلا تدفع الصفحة الرئيسية ثمن sklearn و plotly
+from src.page_registry import get_page, startup_report
+from src import tracing
 # إعداد الصفحة
 st.set_page_config(
     page_title="نظام توصية المنتجات",
@@ -93,6 +90,11 @@ def main():
     
     selected_page = st.sidebar.selectbox("اختر الصفحة", list(pages.keys()))
     
+    # تتبع زمن المراحل لهذه الجلسة فقط
+    show_timings = st.sidebar.checkbox("⏱️ عرض زمن المراحل", value=False)
+    tracing.enable_for_thread(show_timings)
+    tracing.start_run()
+    
     # معلومات المشروع في الشريط الجانبي
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📋 معلومات المشروع")
@@ -109,25 +111,52 @@ def main():
     """)
     
     # المحتوى الرئيسي حسب الصفحة المختارة
-    if selected_page == "🏠 الرئيسية":
-        show_home_page()
-    elif selected_page == "📊 تحليل البيانات":
-        show_data_analysis_page() 
-    elif selected_page == "🔗 قواعد الارتباط":
-        show_association_rules_page()
-    elif selected_page == "🎯 تحليل التجميع":
-        show_clustering_page()
-    elif selected_page == "💰 دراسة تأثير السعر":
-        show_price_impact_page()
-    elif selected_page == "🤖 نظام التوصية":
-        show_recommendation_page()
+    with tracing.span(f"render:{pages[selected_page]}"):
+        if pages[selected_page] == "home":
+            show_home_page()
+        else:
+            show_page = get_page(pages[selected_page])
+            show_page()
+    
+    if show_timings:
+        show_timing_panel()
+    
+    # زمن تحميل كل صفحة في هذه العملية
+    with st.sidebar.expander("⏱️ زمن تحميل الصفحات"):
+        show_startup_report()
+
+def show_startup_report():
+    """عرض زمن أول استيراد لكل صفحة"""
+    report = pd.DataFrame(startup_report())
+    report['import_ms'] = report['import_ms'].fillna(0)
+    report.columns = ['الصفحة', 'الوحدة', 'محملة', 'زمن الاستيراد (ms)']
+    st.dataframe(report[['الصفحة', 'محملة', 'زمن الاستيراد (ms)']], hide_index=True)
+
+def show_timing_panel():
+    """تفصيل زمن مراحل التشغيل الحالي في الشريط الجانبي"""
+    spans = tracing.current_spans()
+    
+    st.sidebar.markdown("### ⏱️ زمن المراحل")
+    if not spans:
+        st.sidebar.info("لا توجد مراحل مسجلة في هذا التشغيل")
+        return
+    
+    # ترتيب المراحل حسب بدايتها مع إزاحة المراحل الفرعية
+    timings = pd.DataFrame(spans).sort_values('start', kind='stable')
+    timings = pd.DataFrame({
+        'المرحلة': ['↳ ' * depth + name for depth, name in zip(timings['depth'], timings['name'])],
+        'الزمن (ms)': timings['wall_ms'].round(1),
+        'المعالج (ms)': timings['cpu_ms'].round(1),
+        'الذاكرة (MB)': timings['mem_delta_mb'].round(1)
+    })
+    st.sidebar.dataframe(timings, hide_index=True)
+    
+    st.sidebar.download_button("تصدير JSON Lines", tracing.to_jsonl(spans), "spans.jsonl")
+    st.sidebar.download_button("تصدير Prometheus", tracing.prometheus_text(spans), "spans.prom")
 
 def check_data_files():
     """فحص وجود ملفات البيانات المطلوبة"""
-    required_files = [
-        "data/Extended_Products_Dataset__25_Products.csv",
-        "data/Invoices_Dataset_for_Association_Rules.csv"
-    ]
+    required_files = [PRODUCTS_FILE, INVOICES_FILE]
     
     return all(os.path.exists(file) for file in required_files)
 
@@ -193,8 +222,8 @@ def show_home_page():
         st.subheader("📈 نظرة سريعة على البيانات")
         
         try:
-            products_df = pd.read_csv("data/Extended_Products_Dataset__25_Products.csv")
-            invoices_df = pd.read_csv("data/Invoices_Dataset_for_Association_Rules.csv") 
+            products_df = load_products(fallback=False)
+            invoices_df = load_invoices(fallback=False, columns=['InvoiceID'])
             
             col1, col2, col3, col4 = st.columns(4)
             
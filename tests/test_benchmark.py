@@ -0,0 +1,14 @@
+import pytest
+
+from src.benchmark import generate_invoices
+
+
+@pytest.mark.parametrize('n_rows', [1_000, 10_000, 100_000])
+@pytest.mark.parametrize('seed', range(10))
+def test_generate_invoices_has_n_rows(n_rows, seed):
+    """كل الأعمدة بطول n_rows مهما كان مجموع أحجام السلال المسحوبة أولاً"""
+    invoices_df = generate_invoices(n_rows, 500, seed=seed)
+    assert len(invoices_df) == n_rows
+    for column in invoices_df.columns:
+        assert len(invoices_df[column]) == n_rows
+    assert invoices_df['InvoiceID'].is_monotonic_increasing